@@ -16,6 +16,8 @@ from dateutil.relativedelta import relativedelta
 import threading
 from .serializers import *
 from .models import *
+from .cache import cached_json, latest_book_change
+from .projections import book_records
 from rest_framework_simplejwt.tokens import RefreshToken
 
 # Existing ViewSets
@@ -24,9 +26,9 @@ class HomeViewSet(viewsets.ViewSet):
     permission_classes = [AllowAny]
 
     def list(self, request):
-        books = Book.objects.prefetch_related('authors').all()
-        serializer = BookSerializer(books, many=True)
-        return Response(serializer.data)
+        # same JSON as BookSerializer, from a values() projection (see projections.py).
+        # The rows show lended and the ratings, so the key changes with every book write
+        return cached_json('home', lambda: book_records(Book.objects.all()), latest_book_change())
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
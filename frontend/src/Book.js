@@ -3,7 +3,7 @@ import axiosInstance from './axiosConfig';
 import { Typography, Rating, Button, Modal, Box } from '@mui/material';
 import LoadingModal from './component/LoadingModal';
 import './style/Book.css';
-import { useParams } from 'react-router-dom';
+import { Link, useParams } from 'react-router-dom';
 
 function Book() {
   useEffect(() => {
@@ -278,6 +278,32 @@ function Book() {
           </div>
         )}
 
+        {/* Books borrowed by the readers of this book */}
+        {book.also_borrowed && book.also_borrowed.length > 0 && (
+          <div style={{ marginBottom: '20px' }}>
+            <Typography variant="h6" gutterBottom>
+              Readers also borrowed
+            </Typography>
+            <div style={{ display: 'flex', gap: '12px', overflowX: 'auto' }}>
+              {book.also_borrowed.map(other => (
+                <Link key={other.isbn} to={`/book/${other.isbn}`} style={{ width: '100px', flexShrink: 0, textDecoration: 'none', color: 'inherit' }}>
+                  {other.cover && (
+                    <img
+                      src={`http://127.0.0.1:8080${other.cover}`}
+                      alt={other.title}
+                      loading="lazy"
+                      style={{ width: '100px' }}
+                    />
+                  )}
+                  <Typography variant="caption" display="block">
+                    {other.title}
+                  </Typography>
+                </Link>
+              ))}
+            </div>
+          </div>
+        )}
+
         <div className="review-section">
           <div style={{ display: 'flex', justifyContent: 'space-between', alignItems: 'center', marginBottom: '20px' }}>
             <Typography variant="h6">
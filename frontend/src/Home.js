@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef, useCallback } from 'react';
 import { Card, CardContent, CardMedia, Typography } from '@mui/material';
 import home from './img/home.png';
 import placeholder from './img/Image-not-found.png';
@@ -15,13 +15,19 @@ function Home() {
   const [loading, setLoading] = useState(true);
   const [searchQuery, setSearchQuery] = useState('');
   const [searchResults, setSearchResults] = useState([]);
+  const [suggestions, setSuggestions] = useState([]);
   const [isSearching, setIsSearching] = useState(false);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [trending, setTrending] = useState([]);
+  const sentinelRef = useRef(null);
 
-  // Fetch initial data when component mounts
+  // Fetch the first catalog page when component mounts
   useEffect(() => {
-    axiosInstance.get('/')
+    axiosInstance.get('/catalog/')
       .then(res => {
-        setDetails(res.data); // Set book details from response
+        setDetails(res.data.results); // Set book details from response
+        setNextCursor(res.data.next); // Cursor of the next page, null on the last one
         setLoading(false); // Set loading to false after data is fetched
       })
       .catch(err => {
@@ -30,6 +36,41 @@ function Home() {
       });
   }, []);
 
+  // Fetch the trending shelf, read from the popularity ranking of the backend
+  useEffect(() => {
+    axiosInstance.get('/trending/', { params: { limit: 8 } })
+      .then(res => setTrending(res.data))
+      .catch(err => console.log(err));
+  }, []);
+
+  // Function to append the next catalog page to the grid
+  const loadMore = useCallback(() => {
+    if (!nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    axiosInstance.get('/catalog/', { params: { cursor: nextCursor } })
+      .then(res => {
+        setDetails(prev => [...prev, ...res.data.results]);
+        setNextCursor(res.data.next);
+      })
+      .catch(err => console.log(err))
+      .finally(() => setLoadingMore(false));
+  }, [nextCursor, loadingMore]);
+
+  // Load the next page when the end of the grid becomes visible
+  useEffect(() => {
+    const sentinel = sentinelRef.current;
+    if (!sentinel || searchQuery) return;
+
+    const observer = new IntersectionObserver(entries => {
+      if (entries[0].isIntersecting) {
+        loadMore();
+      }
+    }, { rootMargin: '400px' });
+    observer.observe(sentinel);
+
+    return () => observer.disconnect(); // Cleanup observer on unmount
+  }, [loadMore, searchQuery, loading]);
+
   // Effect to handle book rotation every 3 seconds
   useEffect(() => {
     if (details.length === 0) return; // Exit if no details
@@ -63,6 +104,21 @@ function Home() {
     return () => clearTimeout(delayDebounceFn); // Cleanup timeout on unmount
   }, [searchQuery]);
 
+  // Effect to load the search box completions, answered by the backend without queries
+  useEffect(() => {
+    if (!searchQuery) {
+      setSuggestions([]);
+      return;
+    }
+    const delayDebounceFn = setTimeout(() => {
+      axios.get('http://127.0.0.1:8080/autocomplete/', { params: { q: searchQuery } })
+        .then(response => setSuggestions(response.data))
+        .catch(error => console.error('Error loading suggestions:', error));
+    }, 100);
+
+    return () => clearTimeout(delayDebounceFn);
+  }, [searchQuery]);
+
   // Function to search books based on query
   const searchBooks = async (query) => {
     setIsSearching(true); // Set searching state to true
@@ -111,6 +167,18 @@ function Home() {
           )}
         </div>
       </div>
+      {trending.length > 0 && (
+        <>
+          <div className="books-title">
+            Trending:
+          </div>
+          <div align="center">
+            {trending.map((book) => (
+              <BookCard key={book.isbn} book={book} /> // Most borrowed lately
+            ))}
+          </div>
+        </>
+      )}
       <div className="books-title">
         Books:
       </div>
@@ -121,7 +189,15 @@ function Home() {
           value={searchQuery}
           onChange={(e) => setSearchQuery(e.target.value)}
           className="search-input"
+          list="search-suggestions"
         />
+        <datalist id="search-suggestions">
+          {suggestions.map((suggestion) => (
+            <option key={`${suggestion.kind}-${suggestion.isbn || suggestion.label}`} value={suggestion.label}>
+              {suggestion.kind}
+            </option>
+          ))}
+        </datalist>
       </div>
       <div align="center">
         {searchQuery ? (
@@ -150,6 +226,7 @@ function Home() {
           )
         )}
       </div>
+      {!searchQuery && <div ref={sentinelRef} style={{ height: '1px' }}></div>}
     </>
   );
 }
@@ -49,43 +49,50 @@ const Navbar = ({ user, setUser }) => {
     }
   }, [setUser]);
 
+  // Function to read the user profile stored in the access token claims
+  const userFromToken = (token) => {
+    const payload = token.split('.')[1].replace(/-/g, '+').replace(/_/g, '/');
+    const claims = JSON.parse(decodeURIComponent(escape(atob(payload))));
+    return {
+      username: claims.username,
+      first_name: claims.first_name,
+      last_name: claims.last_name,
+      email: claims.email,
+      staff: claims.is_staff,
+      superuser: claims.is_superuser,
+    };
+  };
+
   // Function to handle user login
   const handleLogin = () => {
     setIsLoading(true);
-    axiosInstance.post('/get-user-info/', { username })
-      .then(userResponse => {
-        const userData = userResponse.data;
-        if (userData.error) {
-          setLoginErrorMessage(userData.error);
-          setIsLoading(false);
-          return;
-        }
-        
-        axiosInstance.post('/token/', { username, password })
-          .then(response => {
-            localStorage.setItem('access_token', response.data.access);
-            localStorage.setItem('refresh_token', response.data.refresh);
-            axiosInstance.defaults.headers.common['Authorization'] = `Bearer ${response.data.access}`;
-            
-            sessionStorage.setItem('user', JSON.stringify(userData));
-            setUser(userData);
-            window.location.href = '/';
-          })
-          .catch(error => {
-            console.error('Token retrieval error:', error);
-            setLoginErrorMessage('Invalid credentials. Please try again.');
-            setIsLoading(false);
-          });
+    axiosInstance.post('/token/', { username, password })
+      .then(response => {
+        localStorage.setItem('access_token', response.data.access);
+        localStorage.setItem('refresh_token', response.data.refresh);
+        axiosInstance.defaults.headers.common['Authorization'] = `Bearer ${response.data.access}`;
+
+        const userData = userFromToken(response.data.access);
+        sessionStorage.setItem('user', JSON.stringify(userData));
+        setUser(userData);
+        window.location.href = '/';
       })
       .catch(error => {
-        console.error('Error fetching user info:', error);
-        if (error.response?.status === 403) {
-          setIsUserInactive(true);
-          setLoginErrorMessage('User account is inactive. Please verify your email.');
-        } else {
-          setLoginErrorMessage('Invalid credentials. Please try again.');
-        }
-        setIsLoading(false);
+        console.error('Token retrieval error:', error);
+        // The token is refused to inactive users too, check if the email is not verified yet
+        axiosInstance.post('/get-user-info/', { username })
+          .then(() => {
+            setLoginErrorMessage('Invalid credentials. Please try again.');
+          })
+          .catch(userError => {
+            if (userError.response?.status === 403) {
+              setIsUserInactive(true);
+              setLoginErrorMessage('User account is inactive. Please verify your email.');
+            } else {
+              setLoginErrorMessage('Invalid credentials. Please try again.');
+            }
+          })
+          .finally(() => setIsLoading(false));
       });
   };
 
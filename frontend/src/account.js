@@ -53,20 +53,14 @@ function Account() {
       setUser(storedUser);
     }
 
-    axiosInstance.get('/lended-books/')
+    // Loans and wishlist in one request, the profile is already in sessionStorage
+    axiosInstance.get('/my-account/', { params: { fields: 'loans,wishlist' } })
       .then(res => {
-        setLendedBooks(res.data);
+        setLendedBooks(res.data.loans);
+        setWishlist(res.data.wishlist);
       })
       .catch(err => {
-        console.error('Error fetching lended books:', err);
-      });
-
-    axiosInstance.get('/wishlist/')
-      .then(res => {
-        setWishlist(res.data);
-      })
-      .catch(err => {
-        console.error('Error fetching wishlist:', err);
+        console.error('Error fetching account data:', err);
       });
   }, []);
 
@@ -1,9 +1,24 @@
 from django.contrib import admin
-from .models import Genre, Author, Book, Write, Belong, LendedBook, Wishlist, Review
+from .models import Genre, Author, Book, Write, Belong, LendedBook, Wishlist, Review, OutgoingEmail, LoanReminder, \
+    BookNeighbour, RecommendationRun, BookPopularity, GenrePopularity, LoanEvent, LoanDailyStats, AnalyticsRefresh
 
 class BookAdmin(admin.ModelAdmin):
     readonly_fields = ('lended',)
 
+# the loan event log is append-only, it is only written by the borrows and returns
+class LoanEventAdmin(admin.ModelAdmin):
+    list_display = ('occurred_on', 'kind', 'book_id', 'user_id', 'quantity')
+    readonly_fields = ('kind', 'user', 'book', 'quantity', 'due_on', 'occurred_on')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 admin.site.register(Genre)
 admin.site.register(Author)
 admin.site.register(Book, BookAdmin)
@@ -11,4 +26,13 @@ admin.site.register(Write)
 admin.site.register(Belong)
 admin.site.register(LendedBook)
 admin.site.register(Wishlist)
-admin.site.register(Review)
\ No newline at end of file
+admin.site.register(Review)
+admin.site.register(OutgoingEmail)
+admin.site.register(LoanReminder)
+admin.site.register(BookNeighbour)
+admin.site.register(RecommendationRun)
+admin.site.register(BookPopularity)
+admin.site.register(GenrePopularity)
+admin.site.register(LoanEvent, LoanEventAdmin)
+admin.site.register(LoanDailyStats)
+admin.site.register(AnalyticsRefresh)
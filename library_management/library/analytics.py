@@ -0,0 +1,75 @@
+# Circulation analytics for the librarians: copies, loans, overdue loans, borrows and
+# average rating per genre, author and publication year.
+# Computed live, these join Book, Belong/Write and the loans of every book on each call.
+# They are kept in a PostgreSQL materialized view instead (CirculationStats, created by
+# migration 0011), so the endpoint reads a few indexed rows of it. The view reads the
+# borrows from the daily rollup of the loan event log (loan_events.py), not the events.
+# refresh_analytics recomputes it CONCURRENTLY: the reads are not blocked and see the
+# previous rows until the new ones are committed. It runs from the refresh_analytics
+# command on a schedule, or on demand from the API. Every refresh is recorded in
+# AnalyticsRefresh, and the payload gives its duration and how old the rows are.
+import time
+import zlib
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import AnalyticsRefresh, CirculationStats
+
+DIMENSIONS = ('all', 'genre', 'author', 'year')
+RECENT_DAYS = 30     # window of borrowed_recent, set in the SQL of the view
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+# ordering name: order_by of the rows
+ORDERINGS = {
+    'borrowed': ('-borrowed_recent', 'label'),
+    'overdue': ('-overdue_copies', 'label'),
+    'available': ('-available', 'label'),
+    'rating': ('-average_rating', 'label'),
+    'name': ('label',),
+}
+FIELDS = (
+    'key', 'label', 'books', 'copies', 'lended', 'available', 'overdue_loans', 'overdue_copies',
+    'borrowed_recent', 'returned_recent', 'borrowed_total', 'review_count', 'average_rating'
+)
+# two refreshes at once would compute the view twice, the second one is skipped
+REFRESH_LOCK = zlib.crc32(CirculationStats._meta.db_table.encode())
+
+
+class RefreshInProgress(Exception):
+    pass
+
+
+#recomputes the view and returns the AnalyticsRefresh. concurrently=False is faster but
+#blocks the reads of the view while it runs. Raises RefreshInProgress if another refresh is running
+def refresh_analytics(concurrently=True):
+    started_on, start = timezone.now(), time.monotonic()
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('SELECT pg_try_advisory_xact_lock(%s)', [REFRESH_LOCK])
+        if not cursor.fetchone()[0]:
+            raise RefreshInProgress
+        cursor.execute(
+            f"REFRESH MATERIALIZED VIEW {'CONCURRENTLY ' if concurrently else ''}{CirculationStats._meta.db_table}"
+        )
+        return AnalyticsRefresh.objects.create(
+            started_on=started_on, duration=time.monotonic() - start, concurrent=concurrently
+        )
+
+
+#how fresh the rows are: the start of the last refresh (the rows are computed as of then),
+#its duration and the age of the rows in seconds. None before the first refresh
+def freshness(now=None):
+    refresh = AnalyticsRefresh.objects.order_by('-started_on').values('started_on', 'duration').first()
+    if refresh is None:
+        return {'refreshed_on': None, 'refresh_duration': None, 'staleness': None}
+    return {
+        'refreshed_on': refresh['started_on'],
+        'refresh_duration': round(refresh['duration'], 3),
+        'staleness': round(((now or timezone.now()) - refresh['started_on']).total_seconds(), 1),
+    }
+
+
+#rows of a dimension, limit rows in the given ordering
+def circulation_stats(dimension, ordering='borrowed', limit=DEFAULT_LIMIT):
+    rows = CirculationStats.objects.filter(dimension=dimension).order_by(*ORDERINGS[ordering])
+    return list(rows.values(*FIELDS)[:limit])
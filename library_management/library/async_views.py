@@ -0,0 +1,121 @@
+# Async versions of the read-heavy endpoints, for ASGI servers (library_management/asgi.py).
+# They return the same JSON as the views of views.py but use the async ORM, so a slow
+# query does not hold a worker thread. DRF views are synchronous, so these are plain
+# Django views: the JWT is checked with the same authentication class as the API.
+# They are served under /async/ (see urls.py).
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import APIException
+
+from .authentication import ClaimsJWTAuthentication
+from .cache import acached_json
+from .conditional import abook_etag, acatalog_etag, aconditional
+from .covers import cover_srcset, cover_url
+from .models import Author, Book, Genre, Review, Wishlist
+from .pagination import akeyset_page, get_page_size
+from .projections import BOOK_FIELDS, abook_cards, acards_of, neighbour_card, neighbours_of
+from .renderers import dumps
+from .search import search_catalog
+
+
+def json_response(data, status=200):
+    return HttpResponse(dumps(data), content_type='application/json', status=status)
+
+
+#sets request.user from the Authorization header, anonymous without a token
+def jwt_authenticated(view):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            # no query for tokens with the profile claims, see authentication.py
+            result = await sync_to_async(ClaimsJWTAuthentication().authenticate)(request)
+        except APIException as e:
+            data = e.detail if isinstance(e.detail, dict) else {'detail': e.detail}
+            return json_response(data, status=e.status_code)
+        request.user = result[0] if result else AnonymousUser()
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+#one page of the homepage catalog, see views.catalog_api
+@require_GET
+@aconditional(etag_func=acatalog_etag)
+async def catalog_api(request):
+    cursor = request.GET.get('cursor') or ''
+    limit = get_page_size(request)
+
+    async def build():
+        books, next_cursor = await akeyset_page(Book.objects.values(*BOOK_FIELDS), cursor, limit)
+        return {'results': await acards_of(books), 'next': next_cursor}
+
+    try:
+        return await acached_json('catalog', build, cursor, limit)
+    except ValueError:
+        return json_response({'error': 'Invalid cursor'}, status=400)
+
+
+@require_GET
+@aconditional(etag_func=acatalog_etag)
+async def get_authors_api(request):
+    async def build():
+        return [name async for name in Author.objects.values_list('name', flat=True)]
+    return await acached_json('authors', build)
+
+
+@require_GET
+@aconditional(etag_func=acatalog_etag)
+async def get_genres_api(request):
+    async def build():
+        return [name async for name in Genre.objects.values_list('name', flat=True)]
+    return await acached_json('genres', build)
+
+
+#the details of a book and its reviews, see views.get_book_details
+@require_GET
+@jwt_authenticated
+@aconditional(etag_func=abook_etag)
+async def get_book_details(request, isbn):
+    try:
+        book = await Book.objects.prefetch_related('authors', 'genres').aget(isbn=isbn)
+    except Book.DoesNotExist:
+        return json_response({'error': 'Book not found'}, status=404)
+    reviews = [review async for review in Review.objects.filter(book=book).select_related('user')]
+
+    in_wishlist = False
+    if request.user.is_authenticated:
+        in_wishlist = await Wishlist.objects.filter(book=book, user=request.user).aexists()
+    also_borrowed = [neighbour_card(row) async for row in neighbours_of(isbn)]
+
+    return json_response({
+        "title": book.title,
+        "genres": [genre.name for genre in book.genres.all()],
+        "isbn": book.isbn,
+        "authors": [author.name for author in book.authors.all()],
+        "cover": cover_url(book.cover.name, book.cover_variants, "detail"),
+        "cover_srcset": cover_srcset(book.cover.name, book.cover_variants),
+        "copies": book.copies,
+        "lended": book.lended,
+        "year": book.year,
+        "average_rating": float(book.average_rating),
+        "reviews": [
+            {
+                "id": review.id,
+                "user": review.user.username,
+                "rating": review.rating,
+                "content": review.content
+            } for review in reviews
+        ],
+        "in_wishlist": in_wishlist,
+        "also_borrowed": also_borrowed
+    })
+
+
+#search by title, isbn, authors and genres, see views.search_books
+@require_GET
+async def search_books(request):
+    query = request.GET.get('query', '')
+    return json_response(await abook_cards(search_catalog(query)))
@@ -0,0 +1,134 @@
+# JWT authentication without a User query per request.
+# The access tokens carry the profile of the user as claims (see
+# LibraryTokenObtainPairSerializer), so read-only requests get a User built from the
+# token instead of loading it: it has the right pk for the ORM filters and the profile
+# fields, but no password. Writes, and the tokens of staff and superusers, still get the
+# full User row, so a demoted or deactivated librarian loses the admin endpoints at once.
+# The row comes from a short-lived in-process cache when JWT_USER_CACHE_TTL is set
+# (invalidated by signals.py). Every refresh reloads the user, so the claims of the new
+# tokens are at most one access token lifetime old and an inactive user cannot refresh.
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .blacklist import blacklist_cache
+
+PROFILE_CLAIMS = ('username', 'first_name', 'last_name', 'email', 'is_staff', 'is_superuser', 'is_active')
+
+_users = {}     # user id: (expiry, field names, field values)
+_users_lock = threading.Lock()
+
+
+def set_profile_claims(token, user):
+    for claim in PROFILE_CLAIMS:
+        token[claim] = getattr(user, claim)
+
+
+class LibraryTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        set_profile_claims(token, user)
+        return token
+
+
+#refresh token checked against the in-process blacklist filter (blacklist.py) instead of a query
+class LibraryRefreshToken(RefreshToken):
+    def check_blacklist(self):
+        if blacklist_cache.is_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError('Token is blacklisted')
+
+    def blacklist(self):
+        result = super().blacklist()
+        jti = self.payload[api_settings.JTI_CLAIM]
+        transaction.on_commit(lambda: blacklist_cache.add(jti))
+        return result
+
+
+#the refresh token keeps the claims it was issued with: they are stamped again from the
+#current User, and the refresh of a deleted or inactive user is refused
+class LibraryTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = LibraryRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user = User.objects.filter(
+            **{api_settings.USER_ID_FIELD: refresh.payload.get(api_settings.USER_ID_CLAIM)}
+        ).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed('No active account found for the given credentials', code='no_active_account')
+        set_profile_claims(refresh, user)
+
+        data = {'access': str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        return data
+
+
+def forget_user(user_id):
+    with _users_lock:
+        _users.pop(user_id, None)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        # tokens issued before the claims existed are resolved from the database, and so are
+        # the privileges: they are not taken from claims that may be stale
+        if (
+            request.method in SAFE_METHODS and all(claim in validated_token for claim in PROFILE_CLAIMS)
+            and not validated_token['is_staff'] and not validated_token['is_superuser']
+        ):
+            return self.get_claims_user(validated_token), validated_token
+        return self.get_cached_user(validated_token), validated_token
+
+    #unsaved User built from the token, no query
+    def get_claims_user(self, validated_token):
+        if not validated_token['is_active']:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        user = User(
+            **{api_settings.USER_ID_FIELD: validated_token[api_settings.USER_ID_CLAIM]},
+            **{claim: validated_token[claim] for claim in PROFILE_CLAIMS}
+        )
+        user._state.adding = False
+        user._state.db = 'default'
+        return user
+
+    #full User row, kept JWT_USER_CACHE_TTL seconds in this process (not cached with a TTL of 0).
+    #The values of the row are cached and every request gets its own User built from them
+    def get_cached_user(self, validated_token):
+        ttl = getattr(settings, 'JWT_USER_CACHE_TTL', 0)
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if ttl:
+            cached = _users.get(user_id)
+            if cached and cached[0] > time.monotonic():
+                return User.from_db('default', cached[1], cached[2])
+
+        user = self.get_user(validated_token)
+        if ttl:
+            names = [field.attname for field in User._meta.concrete_fields]
+            with _users_lock:
+                _users[user.pk] = (time.monotonic() + ttl, names, [getattr(user, name) for name in names])
+        return user
@@ -0,0 +1,164 @@
+# In-memory prefix index for the search box autocomplete.
+# Every book title, author name and genre name is stored in a sorted list of keys,
+# one key per word of the name (so "pot" completes "Harry Potter"), and a prefix is
+# answered with a binary search instead of a query. Completions are ranked by the
+# all-time number of borrows (BookPopularity.borrows, popularity.py) of the book, or of
+# all the books of the author/genre.
+# The index lives in each worker process and is shared by all its requests. Names are
+# updated right away by the signals (signals.py); the popularity, and the changes made
+# in other workers or without signals (bulk_create, update()), are picked up by a
+# rebuild in the background once the index is older than REFRESH_SECONDS, or sooner
+# when the catalog version (cache.py) changed.
+import bisect
+import heapq
+import re
+import threading
+import time
+import unicodedata
+
+from django.db import connection
+from django.db.models import Sum
+
+from .cache import get_catalog_version
+from .models import Author, Book, Genre
+
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+REFRESH_SECONDS = 300       # popularity refresh
+MIN_REBUILD_SECONDS = 30    # rebuild at most this often after a catalog change
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(text.casefold().split())
+
+
+#keys of a name: the name from the start of each of its words
+def _keys(name):
+    text = normalize(name)
+    return {text[match.start():] for match in re.finditer(r'\w+', text)}
+
+
+class PrefixIndex:
+    def __init__(self):
+        self.keys = []          # sorted (key, entry id)
+        self.entries = {}       # entry id -> {kind, label, popularity, ...}
+        self.lock = threading.Lock()
+
+    #entry ids are (kind, primary key)
+    def add(self, entry_id, label, popularity=0, **extra):
+        with self.lock:
+            self._remove(entry_id)
+            self.entries[entry_id] = {'kind': entry_id[0], 'label': label, 'popularity': popularity, **extra}
+            for key in _keys(label):
+                bisect.insort(self.keys, (key, entry_id))
+
+    def remove(self, entry_id):
+        with self.lock:
+            self._remove(entry_id)
+
+    def _remove(self, entry_id):
+        entry = self.entries.pop(entry_id, None)
+        if entry is None:
+            return
+        for key in _keys(entry['label']):
+            index = bisect.bisect_left(self.keys, (key, entry_id))
+            if index < len(self.keys) and self.keys[index] == (key, entry_id):
+                del self.keys[index]
+
+    #the limit most popular entries with a key starting with prefix. The matches are read
+    #under the lock, a signal can remove an entry at the same time
+    def complete(self, prefix, limit=DEFAULT_LIMIT):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        with self.lock:
+            start = bisect.bisect_left(self.keys, (prefix,))
+            end = bisect.bisect_left(self.keys, (prefix + '\U0010ffff',), start)
+            matches = [self.entries[entry_id] for entry_id in {entry_id for key, entry_id in self.keys[start:end]}]
+        return heapq.nsmallest(limit, matches, key=lambda entry: (-entry['popularity'], entry['label']))
+
+    @classmethod
+    def build(cls):
+        index = cls()
+        entries = []
+        books = Book.objects.values_list('isbn', 'title', 'popularity__borrows')
+        for isbn, title, borrows in books.iterator(chunk_size=5000):
+            entries.append((('title', isbn), title, borrows or 0, {'isbn': isbn}))
+        authors = Author.objects.annotate(borrows=Sum('books__popularity__borrows')).values_list('id', 'name', 'borrows')
+        for author_id, name, borrows in authors:
+            entries.append((('author', author_id), name, borrows or 0, {}))
+        genres = Genre.objects.annotate(borrows=Sum('books__popularity__borrows')).values_list('name', 'borrows')
+        for name, borrows in genres:
+            entries.append((('genre', name), name, borrows or 0, {}))
+
+        # sorted once instead of one insort per key
+        for entry_id, label, popularity, extra in entries:
+            index.entries[entry_id] = {'kind': entry_id[0], 'label': label, 'popularity': popularity, **extra}
+            index.keys.extend((key, entry_id) for key in _keys(label))
+        index.keys.sort()
+        return index
+
+
+class _State:
+    index = None
+    built_at = 0.0
+    version = None
+    rebuilding = False
+    lock = threading.Lock()
+
+
+def _rebuild():
+    try:
+        version = get_catalog_version()
+        index = PrefixIndex.build()
+        _State.index, _State.built_at, _State.version = index, time.monotonic(), version
+    finally:
+        _State.rebuilding = False
+
+
+def _rebuild_in_background():
+    try:
+        _rebuild()
+    finally:
+        connection.close()  # the connection of this thread
+
+
+#the index of this worker, built on the first call, then rebuilt in the background when stale
+def get_index():
+    if _State.index is None:
+        with _State.lock:
+            if _State.index is None:
+                _State.rebuilding = True
+                _rebuild()
+        return _State.index
+
+    age = time.monotonic() - _State.built_at
+    stale = age > REFRESH_SECONDS or (age > MIN_REBUILD_SECONDS and get_catalog_version() != _State.version)
+    if stale and not _State.rebuilding:
+        with _State.lock:
+            if not _State.rebuilding:
+                _State.rebuilding = True
+                threading.Thread(target=_rebuild_in_background, daemon=True).start()
+    return _State.index
+
+
+#incremental updates from the signals, ignored until the index is built.
+#Without a popularity the entry keeps its current one.
+def index_entry(entry_id, label, popularity=None, **extra):
+    index = _State.index
+    if index is not None:
+        if popularity is None:
+            popularity = index.entries.get(entry_id, {}).get('popularity', 0)
+        index.add(entry_id, label, popularity, **extra)
+
+
+def unindex_entry(entry_id):
+    index = _State.index
+    if index is not None:
+        index.remove(entry_id)
+
+
+def autocomplete(prefix, limit=DEFAULT_LIMIT):
+    return get_index().complete(prefix, limit)
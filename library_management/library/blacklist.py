@@ -0,0 +1,150 @@
+# In-process negative cache in front of the refresh token blacklist.
+# Every refresh (token/refresh/) checks that the token is not blacklisted. Almost all
+# of them are not, so the blacklisted jtis of the unexpired tokens are kept in a Bloom
+# filter: a jti that is not in the filter is certainly not blacklisted and needs no
+# query. Only the "maybe" answers go to the database, and their results are kept in a
+# small LRU. The filter follows the blacklist of the other workers by reading the rows
+# added since the last sync every JWT_BLACKLIST_SYNC_SECONDS, and is rebuilt from scratch
+# every REBUILD_SECONDS so that expired tokens leave it.
+# A token blacklisted by this worker is in its filter once the blacklist is committed,
+# but another worker only sees it at its next sync: until then the token (a rotated
+# refresh token, or one of a logout) can still be refreshed there, for up to
+# JWT_BLACKLIST_SYNC_SECONDS. With JWT_BLACKLIST_SYNC_SECONDS = 0 the filter is not
+# used and every check is the indexed lookup on the jti: there is no window, but every
+# refresh runs a query again.
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+SYNC_SECONDS = 5     # default of JWT_BLACKLIST_SYNC_SECONDS
+SYNC_OVERLAP = timedelta(seconds=60)    # rows committed late, after a sync that started before them
+REBUILD_SECONDS = 3600
+ERROR_RATE = 0.01
+MIN_CAPACITY = 10_000
+LRU_SIZE = 10_000
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=ERROR_RATE):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))   # bits
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little')
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class LRU:
+    def __init__(self, size=LRU_SIZE):
+        self.size = size
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            try:
+                self.items.move_to_end(key)
+                return self.items[key]
+            except KeyError:
+                return None
+
+    def put(self, key, value):
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            if len(self.items) > self.size:
+                self.items.popitem(last=False)
+
+    def pop(self, key):
+        with self.lock:
+            self.items.pop(key, None)
+
+
+class BlacklistCache:
+    def __init__(self):
+        self.bloom = None
+        self.recent = LRU()
+        self.lock = threading.RLock()     # add() is also called by sync(), under the lock
+        self.built_at = self.synced_at = 0.0
+        self.synced_until = None    # database time of the last sync
+        self.stats = {'negative': 0, 'lru': 0, 'queries': 0}
+
+    def rebuild(self):
+        now = timezone.now()
+        jtis = list(
+            BlacklistedToken.objects.filter(token__expires_at__gt=now).values_list('token__jti', flat=True).iterator()
+        )
+        # room for the tokens blacklisted until the next rebuild
+        bloom = BloomFilter(max(MIN_CAPACITY, len(jtis) * 2))
+        for jti in jtis:
+            bloom.add(jti)
+        self.bloom, self.recent = bloom, LRU()
+        self.built_at = self.synced_at = time.monotonic()
+        self.synced_until = now
+
+    def sync(self):
+        now = timezone.now()
+        added = BlacklistedToken.objects.filter(
+            blacklisted_at__gt=self.synced_until - SYNC_OVERLAP
+        ).values_list('token__jti', flat=True)
+        for jti in added:
+            self.add(jti)
+        self.synced_at = time.monotonic()
+        self.synced_until = now
+
+    def refresh(self, sync_seconds):
+        age = time.monotonic() - self.built_at
+        if self.bloom is not None and time.monotonic() - self.synced_at < sync_seconds and age < REBUILD_SECONDS:
+            return
+        with self.lock:
+            if self.bloom is None or time.monotonic() - self.built_at >= REBUILD_SECONDS:
+                self.rebuild()
+            elif time.monotonic() - self.synced_at >= sync_seconds:
+                self.sync()
+
+    #called for the tokens blacklisted by this worker and by sync()
+    def add(self, jti):
+        with self.lock:
+            if self.bloom is not None:
+                self.bloom.add(jti)
+                self.recent.pop(jti)    # it may be cached as not blacklisted
+
+    def is_blacklisted(self, jti):
+        sync_seconds = getattr(settings, 'JWT_BLACKLIST_SYNC_SECONDS', SYNC_SECONDS)
+        if not sync_seconds:
+            self.stats['queries'] += 1
+            return BlacklistedToken.objects.filter(token__jti=jti).exists()
+        self.refresh(sync_seconds)
+        if jti not in self.bloom:
+            self.stats['negative'] += 1
+            return False
+        blacklisted = self.recent.get(jti)
+        if blacklisted is not None:
+            self.stats['lru'] += 1
+            return blacklisted
+        self.stats['queries'] += 1
+        blacklisted = BlacklistedToken.objects.filter(token__jti=jti).exists()
+        self.recent.put(jti, blacklisted)
+        return blacklisted
+
+
+blacklist_cache = BlacklistCache()
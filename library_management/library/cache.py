@@ -0,0 +1,115 @@
+# Server-side cache for the catalog lists (books, authors, genres).
+# Responses are stored already rendered to JSON, so a hit skips both the ORM and
+# DRF rendering. Every key contains the catalog version, which the signals in
+# signals.py bump when a Book, Author, Genre, Write or Belong row changes: old
+# entries are never read again and simply expire.
+# Lists that also show the stock and rating columns (lended, review_count...) add the
+# time of the latest book change to their key: borrows, returns and reviews update
+# these columns without a catalog version bump, but always set Book.updated_at.
+# The a* functions are the same for the async views (async_views.py).
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+from django.http import HttpResponse
+
+from .models import Book
+from .renderers import dumps
+
+VERSION_KEY = 'catalog:version'
+STATS_KEY = 'catalog:stats:{}'
+TIMEOUT = 60 * 60 * 24
+
+
+def get_catalog_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # start from the clock, so a lost version key never reuses the number of old entries
+        cache.add(VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+async def aget_catalog_version():
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        await cache.aadd(VERSION_KEY, int(time.time() * 1000), None)
+        version = await cache.aget(VERSION_KEY)
+    return version
+
+
+def _incr_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:  # the key was never set or was evicted
+        get_catalog_version()
+
+
+#after the commit, otherwise a request could cache the old data under the new version
+def bump_catalog_version():
+    transaction.on_commit(_incr_version)
+
+
+#time of the latest write to any book, one lookup on the updated_at index
+def latest_book_change():
+    latest = Book.objects.aggregate(latest=Max('updated_at'))['latest']
+    return latest.timestamp() if latest else 0
+
+
+def _count(name):
+    try:
+        cache.incr(STATS_KEY.format(name))
+    except ValueError:
+        cache.add(STATS_KEY.format(name), 1, None)
+
+
+async def _acount(name):
+    try:
+        await cache.aincr(STATS_KEY.format(name))
+    except ValueError:
+        await cache.aadd(STATS_KEY.format(name), 1, None)
+
+
+def cache_stats():
+    return {
+        'version': get_catalog_version(),
+        'hits': cache.get(STATS_KEY.format('hits'), 0),
+        'misses': cache.get(STATS_KEY.format('misses'), 0),
+    }
+
+
+#returns the cached JSON response for name and parts, calling build() to compute the data on a miss
+def cached_json(name, build, *parts):
+    key = ':'.join(['catalog', str(get_catalog_version()), name, *map(str, parts)])
+    body = cache.get(key)
+    if body is None:
+        _count('misses')
+        body = dumps(build())
+        cache.set(key, body, TIMEOUT)
+        status = 'MISS'
+    else:
+        _count('hits')
+        status = 'HIT'
+    return _json_response(body, status)
+
+
+#same as cached_json, build is a coroutine function
+async def acached_json(name, build, *parts):
+    key = ':'.join(['catalog', str(await aget_catalog_version()), name, *map(str, parts)])
+    body = await cache.aget(key)
+    if body is None:
+        await _acount('misses')
+        body = dumps(await build())
+        await cache.aset(key, body, TIMEOUT)
+        status = 'MISS'
+    else:
+        await _acount('hits')
+        status = 'HIT'
+    return _json_response(body, status)
+
+
+def _json_response(body, status):
+    response = HttpResponse(body, content_type='application/json')
+    response['X-Cache'] = status
+    return response
@@ -0,0 +1,129 @@
+# Creation of new books, used by add_book_api.
+# All authors and genres of a batch are resolved with one IN query per table and
+# the books and their Write/Belong rows are inserted with bulk_create in a single
+# transaction, so a failing book leaves nothing behind.
+# bulk_create sends no signal: what signals.py does for a saved book (search columns,
+# genre rankings, autocomplete, cached lists) is done here for the whole batch. The
+# import_catalog command shares these helpers.
+import json
+
+from django.db import transaction
+
+from .autocomplete import index_entry
+from .cache import bump_catalog_version
+from .covers import schedule_variants
+from .models import Author, Belong, Book, Genre, Write
+from .popularity import sync_genres
+from .search import update_search_index
+
+
+class BookDataError(Exception):
+    pass
+
+
+#authors and genres arrive as JSON strings from multipart forms and as lists from JSON bodies
+def _names(value):
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            raise BookDataError('Invalid JSON format for authors or genres')
+    return list(dict.fromkeys(value))
+
+
+#returns {name: id} of the authors. A name shared by several authors is refused, a book
+#cannot tell which of them wrote it. Missing authors are created if create is set, refused otherwise
+def resolve_authors(names, create=False):
+    author_ids = {}
+    for author_name, author_id in Author.objects.filter(name__in=names).values_list('name', 'id'):
+        if author_name in author_ids:
+            raise BookDataError(f'Several authors are named "{author_name}"')
+        author_ids[author_name] = author_id
+    missing = sorted(name for name in names if name not in author_ids)
+    if missing and not create:
+        raise BookDataError(f'Author "{missing[0]}" does not exist')
+    for author in Author.objects.bulk_create([Author(name=name) for name in missing]):
+        author_ids[author.name] = author.id
+    return author_ids
+
+
+#the signals of signals.py for books written with bulk_create, in the current transaction:
+#titles maps their isbns to their titles, authors the ids of new authors to their names
+def books_written(titles, authors=None, genres=()):
+    isbns = list(titles)
+    update_search_index(isbns)
+    sync_genres(isbns)
+
+    def index():
+        for isbn, title in titles.items():
+            index_entry(('title', isbn), title, isbn=isbn)
+        for author_id, name in (authors or {}).items():
+            index_entry(('author', author_id), name)
+        for name in genres:
+            index_entry(('genre', name), name)
+    transaction.on_commit(index)
+
+
+#creates the books described by entries (dicts with isbn, title, copies, year, authors and genres).
+#covers maps an isbn to its uploaded cover file. Returns the list of created isbns.
+def add_books(entries, covers=None):
+    covers = covers or {}
+    if not isinstance(entries, list):
+        raise BookDataError('books must be a list of books')
+    books = []
+    for entry in entries:
+        if not isinstance(entry, dict):
+            raise BookDataError('Each book must be an object with isbn, title, copies, year, authors and genres')
+        try:
+            books.append({
+                'isbn': entry['isbn'],
+                'title': entry['title'],
+                'copies': entry['copies'],
+                'year': entry['year'],
+                'authors': _names(entry['authors']),
+                'genres': _names(entry['genres']),
+            })
+        except KeyError as e:
+            raise BookDataError(f'Missing field {e}')
+
+    isbns = [book['isbn'] for book in books]
+    if len(set(isbns)) != len(isbns):
+        raise BookDataError('The same ISBN appears more than once')
+    existing = Book.objects.filter(isbn__in=isbns).values_list('isbn', flat=True).first()
+    if existing is not None:
+        raise BookDataError(f'A book with the ISBN {existing} already exists')
+
+    author_ids = resolve_authors({name for book in books for name in book['authors']})
+
+    genre_names = {name for book in books for name in book['genres']}
+    existing_genres = set(Genre.objects.filter(name__in=genre_names).values_list('name', flat=True))
+    for book in books:
+        for genre_name in book['genres']:
+            if genre_name not in existing_genres:
+                raise BookDataError(f'Genre "{genre_name}" does not exist')
+
+    with transaction.atomic():
+        created = Book.objects.bulk_create([
+            Book(
+                isbn=book['isbn'],
+                title=book['title'],
+                copies=book['copies'],
+                year=book['year'],
+                cover=covers.get(book['isbn'])
+            )
+            for book in books
+        ])
+        Write.objects.bulk_create([
+            Write(book_id=book['isbn'], author_id=author_ids[name])
+            for book in books for name in book['authors']
+        ])
+        Belong.objects.bulk_create([
+            Belong(book_id=book['isbn'], genre_id=name)
+            for book in books for name in book['genres']
+        ])
+        books_written({book['isbn']: book['title'] for book in books})
+        for book in created:
+            if book.cover:
+                schedule_variants(book.isbn, book.cover.name)
+    bump_catalog_version()
+    return isbns
@@ -0,0 +1,65 @@
+# Borrow and return paths shared by the views.
+# Borrowing is done with conditional single statements in one transaction, so two
+# requests racing for the last copy cannot both get it and no row is read in Python
+# before being written back. Both paths log a LoanEvent in their transaction
+# (loan_events.py).
+from datetime import date
+
+from dateutil.relativedelta import relativedelta
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .loan_events import log_loan_event
+from .models import Book, LendedBook, LoanEvent, Wishlist
+from .popularity import BORROW, RETURN, record
+
+
+class BookUnavailable(Exception):
+    pass
+
+
+#lends one copy of the book to the user and returns the title of the book.
+#Raises Book.DoesNotExist or BookUnavailable if there is no copy left.
+def borrow_book(user, isbn):
+    today = date.today()
+    with transaction.atomic(), connection.cursor() as cursor:
+        # only succeeds if a copy is still available, the row lock serializes racing borrows
+        cursor.execute(
+            f'UPDATE {Book._meta.db_table} SET lended = lended + 1, updated_at = now() '
+            'WHERE isbn = %s AND lended < copies RETURNING title',
+            [isbn]
+        )
+        row = cursor.fetchone()
+        if row is None:
+            if not Book.objects.filter(isbn=isbn).exists():
+                raise Book.DoesNotExist
+            raise BookUnavailable
+
+        cursor.execute(
+            f'INSERT INTO {LendedBook._meta.db_table} (user_id, book_id, number, borrowed_on, return_on) '
+            'VALUES (%s, %s, 1, %s, %s) '
+            f'ON CONFLICT (user_id, book_id) DO UPDATE SET number = {LendedBook._meta.db_table}.number + 1 '
+            'RETURNING return_on',
+            [user.pk, isbn, today, today + relativedelta(months=1)]
+        )
+        return_on = cursor.fetchone()[0]
+        Wishlist.objects.filter(user=user, book_id=isbn).delete()
+        record(isbn, BORROW)
+        log_loan_event(LoanEvent.BORROW, user.pk, isbn, due_on=return_on)
+    return row[0]
+
+
+#returns quantity copies of a loan (at most its number): the loan is deleted when every
+#copy is back
+def return_loan(loan, quantity):
+    with transaction.atomic():
+        if loan.number == quantity:
+            loan.delete()
+        else:
+            loan.number -= quantity
+            loan.save(update_fields=['number'])
+
+        Book.objects.filter(isbn=loan.book_id).update(lended=F('lended') - quantity, updated_at=timezone.now())
+        record(loan.book_id, RETURN, quantity)
+        log_loan_event(LoanEvent.RETURN, loan.user_id, loan.book_id, quantity, due_on=loan.return_on)
@@ -0,0 +1,123 @@
+# Conditional GET (ETag / Last-Modified) for the book and catalog endpoints.
+# The validators are computed from cheap columns (Book.updated_at, the catalog
+# version of cache.py) so a request with a matching If-None-Match gets a 304
+# without running the queries of the view.
+# The book page also shows its "readers also borrowed" neighbours, which change without
+# the book: its ETag includes their isbns and updated_at, and it has no Last-Modified
+# (a date could not tell that a neighbour left the list).
+# The a* functions are the same for the async views (async_views.py).
+import hashlib
+from calendar import timegm
+from functools import wraps
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import condition
+
+from .cache import aget_catalog_version, get_catalog_version
+from .models import Book, BookNeighbour, Wishlist
+
+
+def make_etag(*parts):
+    return '"%s"' % hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()
+
+
+#like django's @condition, but the browser is also told to always revalidate
+#and the validators depend on the logged user (in_wishlist is part of the book page)
+def conditional(etag_func=None, last_modified_func=None):
+    def decorator(view):
+        conditional_view = condition(etag_func=etag_func, last_modified_func=last_modified_func)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            patch_cache_control(response, no_cache=True)
+            patch_vary_headers(response, ['Authorization'])
+            return response
+        return wrapper
+    return decorator
+
+
+#same as conditional, for async views with coroutine validator functions
+def aconditional(etag_func=None, last_modified_func=None):
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            etag = last_modified = None
+            if request.method in ('GET', 'HEAD'):
+                if etag_func:
+                    etag = await etag_func(request, *args, **kwargs)
+                    etag = quote_etag(etag) if etag else None
+                if last_modified_func:
+                    modified = await last_modified_func(request, *args, **kwargs)
+                    last_modified = timegm(modified.utctimetuple()) if modified else None
+                response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+                if response is not None:    # 304 Not Modified
+                    return response
+            response = await view(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD') and response.status_code == 200:
+                if etag and not response.has_header('ETag'):
+                    response['ETag'] = etag
+                if last_modified and not response.has_header('Last-Modified'):
+                    response['Last-Modified'] = http_date(last_modified)
+            patch_cache_control(response, no_cache=True)
+            patch_vary_headers(response, ['Authorization'])
+            return response
+        return wrapper
+    return decorator
+
+
+#Book.updated_at, read once per request
+def book_last_modified(request, isbn):
+    if not hasattr(request, '_book_updated_at'):
+        request._book_updated_at = Book.objects.filter(isbn=isbn).values_list('updated_at', flat=True).first()
+    return request._book_updated_at
+
+
+#the neighbours of the book page in their order, with the time they last changed
+def neighbour_versions(isbn):
+    return BookNeighbour.objects.filter(book_id=isbn).order_by('rank').values_list('neighbour_id', 'neighbour__updated_at')
+
+
+def book_etag(request, isbn):
+    updated_at = book_last_modified(request, isbn)
+    if updated_at is None:
+        return None
+    in_wishlist = (
+        request.user.is_authenticated and
+        Wishlist.objects.filter(book_id=isbn, user=request.user).exists()
+    )
+    neighbours = [f'{neighbour}@{changed.timestamp()}' for neighbour, changed in neighbour_versions(isbn)]
+    return make_etag('book', isbn, updated_at.timestamp(), in_wishlist, *neighbours)
+
+
+async def abook_last_modified(request, isbn):
+    if not hasattr(request, '_book_updated_at'):
+        request._book_updated_at = await Book.objects.filter(isbn=isbn).values_list('updated_at', flat=True).afirst()
+    return request._book_updated_at
+
+
+async def abook_etag(request, isbn):
+    updated_at = await abook_last_modified(request, isbn)
+    if updated_at is None:
+        return None
+    in_wishlist = (
+        request.user.is_authenticated and
+        await Wishlist.objects.filter(book_id=isbn, user=request.user).aexists()
+    )
+    neighbours = [f'{neighbour}@{changed.timestamp()}' async for neighbour, changed in neighbour_versions(isbn)]
+    return make_etag('book', isbn, updated_at.timestamp(), in_wishlist, *neighbours)
+
+
+def reviews_etag(request, isbn):
+    updated_at = book_last_modified(request, isbn)
+    return make_etag('reviews', isbn, updated_at.timestamp()) if updated_at else None
+
+
+#the catalog lists only change when the catalog version is bumped
+def catalog_etag(request, *args, **kwargs):
+    return make_etag('catalog', get_catalog_version(), request.get_full_path())
+
+
+async def acatalog_etag(request, *args, **kwargs):
+    return make_etag('catalog', await aget_catalog_version(), request.get_full_path())
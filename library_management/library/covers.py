@@ -0,0 +1,114 @@
+# Resized WebP variants of the book covers.
+# Librarians upload covers of any size, the lists only need small images: for every
+# cover a thumbnail, a card and a detail variant are generated (in a process pool, so
+# the request that uploaded the cover does not wait) and the list endpoints return
+# the variant URLs instead of the original file.
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import django
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image
+
+from .cache import bump_catalog_version
+from .models import Book
+
+# variant name: maximum width in pixels
+VARIANTS = {'thumb': 160, 'card': 320, 'detail': 640}
+WEBP_QUALITY = 80
+
+_executor = None
+logger = logging.getLogger('library.covers')
+
+
+def variant_name(cover_name, variant):
+    # the extension is kept, cover.jpg and cover.png are different uploads
+    return f'book_covers/variants/{os.path.basename(cover_name)}.{variant}.webp'
+
+
+#returns the URL of a cover variant, or of the original while the variants are not generated
+def cover_url(cover_name, has_variants, variant='card'):
+    if not cover_name:
+        return None
+    return default_storage.url(variant_name(cover_name, variant) if has_variants else cover_name)
+
+
+#srcset attribute with every variant, None while the variants are not generated
+def cover_srcset(cover_name, has_variants):
+    if not cover_name or not has_variants:
+        return None
+    return ', '.join(
+        f'{default_storage.url(variant_name(cover_name, variant))} {width}w' for variant, width in VARIANTS.items()
+    )
+
+
+#resizes one cover into every variant, runs in the worker processes (no database access)
+def generate_variants(cover_name):
+    with default_storage.open(cover_name, 'rb') as f:
+        image = Image.open(f)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+    for variant, width in VARIANTS.items():
+        resized = image.copy()
+        resized.thumbnail((width, width * 2))   # never upscaled, the aspect ratio is kept
+        output = BytesIO()
+        resized.save(output, 'WEBP', quality=WEBP_QUALITY, method=4)
+        name = variant_name(cover_name, variant)
+        if default_storage.exists(name):
+            default_storage.delete(name)
+        default_storage.save(name, ContentFile(output.getvalue()))
+    return cover_name
+
+
+#marks the variants of the books as ready with one UPDATE, unless a cover was replaced in the meantime.
+#isbns_by_cover is a list of (cover name, isbn) pairs
+def mark_variants_ready(isbns_by_cover):
+    if not isbns_by_cover:
+        return
+    matches = Q()
+    for cover_name, isbn in isbns_by_cover:
+        matches |= Q(isbn=isbn, cover=cover_name)
+    Book.objects.filter(matches).update(cover_variants=True, updated_at=timezone.now())
+    bump_catalog_version()
+
+
+#the pool is created by a web worker that already runs threads: its processes are spawned,
+#not forked, so they do not inherit a lock held by another thread. A spawned process starts
+#from scratch and sets Django up before its first task
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=getattr(settings, 'COVER_VARIANT_WORKERS', 2),
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup,
+        )
+    return _executor
+
+
+def _on_done(isbn, future):
+    try:
+        mark_variants_ready([(future.result(), isbn)])
+    except Exception:
+        # the book keeps serving its original cover, generate_cover_variants can retry
+        logger.exception('Cover variants of %s failed', isbn)
+    finally:
+        connection.close()  # the callback runs in a thread of the executor
+
+
+#generates the variants of the new cover of a book in the background, once the upload is committed
+def schedule_variants(isbn, cover_name):
+    def submit():
+        future = get_executor().submit(generate_variants, cover_name)
+        future.add_done_callback(lambda future: _on_done(isbn, future))
+    transaction.on_commit(submit)
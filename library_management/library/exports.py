@@ -0,0 +1,70 @@
+# Streaming export of the loan ledger (every LendedBook with its book, authors and user).
+# The rows are read through a server-side cursor, chunk by chunk, with the authors of each
+# book already joined into one string by PostgreSQL, and written to the response while
+# they are read: the memory used does not depend on the number of loans.
+import csv
+import io
+import json
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.db.models import OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Coalesce
+
+from .models import LendedBook, Write
+
+LEDGER_FIELDS = ('isbn', 'title', 'authors', 'borrowed_by', 'number', 'borrowed_on', 'return_on')
+CHUNK_SIZE = 2000
+
+
+#yields the loans as dicts with the LEDGER_FIELDS keys, ordered by id
+def ledger_rows(chunk_size=CHUNK_SIZE):
+    authors = (
+        Write.objects.filter(book=OuterRef('book'))
+        .values('book')
+        .annotate(names=StringAgg('author__name', ', ', ordering='author__name'))
+        .values('names')
+    )
+    loans = (
+        LendedBook.objects.order_by('id')
+        .annotate(authors=Coalesce(Subquery(authors), Value(''), output_field=TextField()))
+        .values_list('book__isbn', 'book__title', 'authors', 'user__username', 'number', 'borrowed_on', 'return_on')
+    )
+    for row in loans.iterator(chunk_size=chunk_size):   # server-side cursor on PostgreSQL
+        yield dict(zip(LEDGER_FIELDS, row))
+
+
+#yields the ledger as CSV, one string per chunk of rows
+def ledger_csv(chunk_size=CHUNK_SIZE):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=LEDGER_FIELDS)
+    writer.writeheader()
+    for index, row in enumerate(ledger_rows(chunk_size), 1):
+        writer.writerow(row)
+        if index % chunk_size == 0:
+            yield _drain(buffer)
+    yield _drain(buffer)
+
+
+#yields the ledger as newline delimited JSON, one string per chunk of rows
+def ledger_ndjson(chunk_size=CHUNK_SIZE):
+    lines = []
+    for row in ledger_rows(chunk_size):
+        lines.append(json.dumps(row, default=str) + '\n')
+        if len(lines) == chunk_size:
+            yield ''.join(lines)
+            lines = []
+    yield ''.join(lines)
+
+
+def _drain(buffer):
+    data = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return data
+
+
+# output name: (generator, content type, file extension)
+EXPORT_FORMATS = {
+    'csv': (ledger_csv, 'text/csv', 'csv'),
+    'ndjson': (ledger_ndjson, 'application/x-ndjson', 'ndjson'),
+}
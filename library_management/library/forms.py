@@ -1,5 +1,6 @@
 from django import forms
 from .models import Write, Genre, Author, Book, Review, LendedBook, Wishlist, Belong
+from .covers import schedule_variants
 from django.shortcuts import redirect, render
 from django.contrib.auth.forms import SetPasswordForm
 from django.contrib.auth.forms import PasswordChangeForm
@@ -42,9 +43,14 @@ class BookForm(forms.ModelForm):
 
     def save(self, commit=True):
         book = super().save(commit=False)
+        new_cover = 'cover' in self.changed_data
+        if new_cover:
+            book.cover_variants = False     # served from the original until the new variants exist
         
         if commit:
             book.save()
+            if new_cover and book.cover:
+                schedule_variants(book.isbn, book.cover.name)
         return book
 
 class ReviewForm(forms.ModelForm):
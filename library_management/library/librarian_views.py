@@ -1,8 +1,9 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.models import User
 from django.contrib import messages
-from django.db.models import Q, F
+from django.db.models import Q
 from .models import Book, LendedBook
+from .circulation import return_loan
 from .forms import BookForm
 
 def librarian_page(request):
@@ -39,13 +40,7 @@ def return_book(request, book_id, username):
         returnedBook = get_object_or_404(LendedBook, book_id=book_id, user__username = username)
         
         if returnedBook.number >= quantity:
-            if returnedBook.number == quantity:
-                returnedBook.delete()
-            else:
-                returnedBook.number -= quantity
-                returnedBook.save()
-                
-            Book.objects.filter(isbn=book_id).update(lended=F('lended') - quantity)
+            return_loan(returnedBook, quantity)
             messages.success(request, f"{quantity} book(s) returned successfully.")
         else:
             messages.error(request, "Cannot return more books than borrowed.")
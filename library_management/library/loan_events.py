@@ -0,0 +1,151 @@
+# Append-only loan history.
+# LendedBook only holds the current loans: a returned loan is deleted, and every borrow
+# and return updates its rows. Reading it for history or reports would both miss the
+# past and scan the table the circulation desk writes to. Every borrow and return also
+# inserts a LoanEvent in its own transaction (circulation.py), and nothing updates or
+# deletes an event (but the teardown of bench_borrow, for the loans it made up).
+# The event table is partitioned by month on occurred_on (migration 0010), so a query on
+# a date range only scans the partitions of these months, and an old month can be
+# detached or archived without touching the others. The rollup_loan_events command
+# creates the partitions of the coming months and rolls the events up into
+# LoanDailyStats, one row per book and day; the reports read the rollup.
+from datetime import datetime, time, timedelta
+
+from django.db import connection, transaction
+from django.db.models import Max, Min, Sum
+from django.utils import timezone
+
+from .models import LendedBook, LoanDailyStats, LoanEvent
+
+BORROW, RETURN = LoanEvent.BORROW, LoanEvent.RETURN
+MONTHS_AHEAD = 3
+DEFAULT_PARTITION = f'{LoanEvent._meta.db_table}_default'
+
+
+#inserts the event, in the transaction of the borrow or return
+def log_loan_event(kind, user_id, isbn, quantity=1, due_on=None, when=None):
+    LoanEvent.objects.create(
+        kind=kind, user_id=user_id, book_id=isbn, quantity=quantity, due_on=due_on,
+        occurred_on=when or timezone.now()
+    )
+
+
+def _start_of(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _first_of_next_month(day):
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def partition_name(month):
+    return f'{LoanEvent._meta.db_table}_{month:%Y%m}'
+
+
+def partitions():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+            'WHERE i.inhparent = %s::regclass ORDER BY c.relname',
+            [LoanEvent._meta.db_table]
+        )
+        return [name for name, in cursor.fetchall()]
+
+
+#creates the monthly partitions from the month of start (today by default) to
+#months_ahead months after the current one, returns the names of the partitions created
+def ensure_partitions(start=None, months_ahead=MONTHS_AHEAD):
+    today = timezone.localdate()
+    month = (start or today).replace(day=1)
+    last = today.replace(day=1)
+    for _ in range(months_ahead):
+        last = _first_of_next_month(last)
+
+    existing, created = set(partitions()), []
+    while month <= last:
+        if partition_name(month) not in existing:
+            _create_partition(month)
+            created.append(partition_name(month))
+        month = _first_of_next_month(month)
+    return created
+
+
+#a new partition cannot be attached while the default partition holds rows of its range:
+#these rows are moved to the new partition while the default one is detached
+def _create_partition(month):
+    table, name = LoanEvent._meta.db_table, partition_name(month)
+    start, end = _start_of(month).isoformat(), _start_of(_first_of_next_month(month)).isoformat()
+    in_range = f"occurred_on >= '{start}' AND occurred_on < '{end}'"
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE {in_range})')
+        stray = cursor.fetchone()[0]
+        if stray:
+            cursor.execute(f'ALTER TABLE {table} DETACH PARTITION {DEFAULT_PARTITION}')
+        cursor.execute(f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM ('{start}') TO ('{end}')")
+        if stray:
+            cursor.execute(f'INSERT INTO {name} SELECT * FROM {DEFAULT_PARTITION} WHERE {in_range}')
+            cursor.execute(f'DELETE FROM {DEFAULT_PARTITION} WHERE {in_range}')
+            cursor.execute(f'ALTER TABLE {table} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT')
+
+
+#logs the current loans as borrow events, once, when the log is deployed: the loans
+#returned before it are not known. Returns the number of events inserted
+def backfill():
+    if LoanEvent.objects.exists():
+        return 0
+    first = LendedBook.objects.aggregate(first=Min('borrowed_on'))['first']
+    if first is None:
+        return 0
+    ensure_partitions(first)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {LoanEvent._meta.db_table} (kind, user_id, book_id, quantity, due_on, occurred_on) '
+            'SELECT %s, user_id, book_id, number, return_on, borrowed_on::timestamp AT TIME ZONE %s '
+            f'FROM {LendedBook._meta.db_table} ORDER BY id',
+            [BORROW, timezone.get_current_timezone_name()]
+        )
+        return cursor.rowcount
+
+
+#recomputes the rollup of the days since..until (inclusive) from the events of these days
+#and returns the number of rows written. By default from the last day rolled up (it was
+#maybe rolled up before it ended) to today.
+def rollup(since=None, until=None):
+    until = until or timezone.localdate()
+    if since is None:
+        since = LoanDailyStats.objects.aggregate(last=Max('day'))['last']
+    if since is None:
+        first = LoanEvent.objects.aggregate(first=Min('occurred_on'))['first']
+        if first is None:
+            return 0
+        since = timezone.localdate(first)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        LoanDailyStats.objects.filter(day__range=(since, until)).delete()
+        # the bounds are literals in the query, so PostgreSQL prunes the other partitions
+        cursor.execute(
+            f'INSERT INTO {LoanDailyStats._meta.db_table} (day, book_id, borrowed, returned) '
+            'SELECT (occurred_on AT TIME ZONE %s)::date, book_id, '
+            'COALESCE(SUM(quantity) FILTER (WHERE kind = %s), 0), COALESCE(SUM(quantity) FILTER (WHERE kind = %s), 0) '
+            f'FROM {LoanEvent._meta.db_table} WHERE occurred_on >= %s AND occurred_on < %s '
+            'GROUP BY 1, 2',
+            [timezone.get_current_timezone_name(), BORROW, RETURN, _start_of(since), _start_of(until + timedelta(days=1))]
+        )
+        return cursor.rowcount
+
+
+#copies borrowed and returned per day between since and until (inclusive), read from the rollup
+def daily_circulation(since, until, isbn=None):
+    rows = LoanDailyStats.objects.filter(day__gte=since, day__lte=until)
+    if isbn is not None:
+        rows = rows.filter(book_id=isbn)
+    return rows.values('day').annotate(borrowed=Sum('borrowed'), returned=Sum('returned')).order_by('day')
+
+
+#the events of a book between two datetimes, newest first: only the partitions of the range are scanned
+def book_events(isbn, start, end):
+    return (
+        LoanEvent.objects.filter(book_id=isbn, occurred_on__gte=start, occurred_on__lt=end)
+        .order_by('-occurred_on')
+        .values('kind', 'user_id', 'quantity', 'due_on', 'occurred_on')
+    )
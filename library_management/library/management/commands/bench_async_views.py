@@ -0,0 +1,142 @@
+import asyncio
+import json
+import random
+import threading
+import time
+
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+
+from library.authentication import LibraryTokenObtainPairSerializer
+from library.models import Book
+from .bench_endpoints import percentile
+from .seed_benchmark_data import ISBN_PREFIX, USER_PREFIX, WORDS
+
+# name: path of the WSGI view built from a random generator and the sample isbns, the async view is under /async
+ENDPOINTS = {
+    'catalog': lambda rnd, isbns: '/catalog/',
+    'authors': lambda rnd, isbns: '/get_authors_api/',
+    'genres': lambda rnd, isbns: '/get_genres_api/',
+    'book_details': lambda rnd, isbns: f'/book/{rnd.choice(isbns)}/',
+    'search_books': lambda rnd, isbns: f'/search-books/?query={rnd.choice(WORDS)}',
+}
+
+
+def close_connection():
+    connection.close()
+
+
+class Command(BaseCommand):
+    help = ('Compares the throughput of the WSGI views (one thread per concurrent request) with the async '
+            'views of async_views.py served through the ASGI handler (one event loop), in process, '
+            'at several concurrencies. Run seed_benchmark_data first.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoints', nargs='+', choices=list(ENDPOINTS), default=list(ENDPOINTS))
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+        parser.add_argument('--requests', type=int, default=400, help='Requests per endpoint and run.')
+        parser.add_argument('--no-cache', action='store_true', help='Disable the response cache.')
+        parser.add_argument('--output', default='bench_async_views.json')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        isbns = list(Book.objects.filter(isbn__startswith=ISBN_PREFIX).values_list('isbn', flat=True)[:1000])
+        user = User.objects.filter(username__startswith=USER_PREFIX).first()
+        if not isbns or user is None:
+            raise CommandError('No benchmark data, run seed_benchmark_data first.')
+        token = str(LibraryTokenObtainPairSerializer.get_token(user).access_token)
+        headers = {'Authorization': f'Bearer {token}'}
+        connection.close()
+
+        overrides = {'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver']}     # host of the test clients
+        if options['no_cache']:
+            overrides['CACHES'] = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+        results = []
+        with override_settings(**overrides):
+            for name in options['endpoints']:
+                for concurrency in options['concurrency']:
+                    wsgi = self.run_wsgi(name, isbns, headers, concurrency, options)
+                    asgi = asyncio.run(self.run_asgi(name, isbns, headers, concurrency, options))
+                    results.append({'endpoint': name, 'concurrency': concurrency, 'wsgi': wsgi, 'asgi': asgi})
+                    self.stdout.write(
+                        f"{name:13} x{concurrency:<3} "
+                        f"WSGI {wsgi['throughput_rps']:7.1f} req/s p99 {wsgi['latency_ms']['p99']:7.1f}ms   "
+                        f"ASGI {asgi['throughput_rps']:7.1f} req/s p99 {asgi['latency_ms']['p99']:7.1f}ms   "
+                        f"errors {wsgi['errors']}/{asgi['errors']}"
+                    )
+
+        with open(options['output'], 'w') as f:
+            json.dump(results, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    #concurrency threads, each with its own test client, like a threaded WSGI server
+    def run_wsgi(self, name, isbns, headers, concurrency, options):
+        latencies, errors = [], []
+        lock = threading.Lock()
+        per_worker = -(-options['requests'] // concurrency)
+
+        def worker(index):
+            rnd = random.Random(options['seed'] * 1000 + index)
+            client = Client()
+            local, failed = [], 0
+            try:
+                for _ in range(per_worker):
+                    start = time.perf_counter()
+                    response = client.get(ENDPOINTS[name](rnd, isbns), headers=headers)
+                    local.append((time.perf_counter() - start) * 1000)
+                    failed += response.status_code >= 400
+            finally:
+                connection.close()
+                with lock:
+                    latencies.extend(local)
+                    errors.append(failed)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self.summary(latencies, sum(errors), time.perf_counter() - start)
+
+    #concurrency tasks on one event loop, through the ASGI handler
+    async def run_asgi(self, name, isbns, headers, concurrency, options):
+        latencies = []
+        errors = 0
+        per_worker = -(-options['requests'] // concurrency)
+
+        async def worker(index):
+            nonlocal errors
+            rnd = random.Random(options['seed'] * 1000 + index)
+            client = AsyncClient()
+            for _ in range(per_worker):
+                start = time.perf_counter()
+                # like ASGIHandler, every request gets its own thread for the sync parts (the ORM)
+                async with ThreadSensitiveContext():
+                    response = await client.get('/async' + ENDPOINTS[name](rnd, isbns), headers=headers)
+                    await sync_to_async(close_connection)()     # the test client keeps it open
+                latencies.append((time.perf_counter() - start) * 1000)
+                errors += response.status_code >= 400
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        return self.summary(latencies, errors, time.perf_counter() - start)
+
+    def summary(self, latencies, errors, elapsed):
+        return {
+            'requests': len(latencies),
+            'errors': errors,
+            'duration_s': elapsed,
+            'throughput_rps': len(latencies) / elapsed,
+            'latency_ms': {
+                'p50': percentile(latencies, 50),
+                'p95': percentile(latencies, 95),
+                'p99': percentile(latencies, 99),
+                'mean': sum(latencies) / len(latencies),
+            },
+        }
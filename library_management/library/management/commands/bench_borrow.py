@@ -0,0 +1,107 @@
+import threading
+import time
+from datetime import date
+
+from dateutil.relativedelta import relativedelta
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from library.circulation import BookUnavailable, borrow_book
+from library.models import Book, LendedBook, LoanDailyStats, LoanEvent, Wishlist
+
+BENCH_ISBN = 'bench-borrow'
+BENCH_USER = 'bench_borrow_{}'
+
+
+#the borrow path before it was moved to circulation.borrow_book, kept for comparison
+def legacy_borrow(user, isbn):
+    book = Book.objects.get(isbn=isbn)
+    if book.copies > book.lended:
+        book.lended += 1
+        book.save()
+        borrowed_book, created = LendedBook.objects.get_or_create(
+            user=user,
+            book=book,
+            defaults={
+                'number': 1,
+                'borrowed_on': date.today(),
+                'return_on': date.today() + relativedelta(months=1),
+            }
+        )
+        if not created:
+            borrowed_book.number += 1
+        borrowed_book.save()
+        Wishlist.objects.filter(user=user, book=book).delete()
+        return book.title
+    raise BookUnavailable
+
+
+class Command(BaseCommand):
+    help = 'Hammers the borrow path of one book from many threads and reports throughput and oversold copies.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--requests', type=int, default=200, help='Borrow attempts per thread.')
+        parser.add_argument('--copies', type=int, default=1000, help='Copies of the hot book.')
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--legacy', action='store_true',
+                            help='Benchmark the old read-modify-write borrow instead.')
+
+    def handle(self, *args, **options):
+        borrow = legacy_borrow if options['legacy'] else borrow_book
+        users = self.setup(options['users'], options['copies'])
+        results = {'ok': 0, 'unavailable': 0, 'errors': 0}
+        lock = threading.Lock()
+
+        def worker(index):
+            counts = {'ok': 0, 'unavailable': 0, 'errors': 0}
+            try:
+                for i in range(options['requests']):
+                    user = users[(index + i) % len(users)]
+                    try:
+                        borrow(user, BENCH_ISBN)
+                        counts['ok'] += 1
+                    except BookUnavailable:
+                        counts['unavailable'] += 1
+                    except Exception:
+                        counts['errors'] += 1
+            finally:
+                connection.close()
+                with lock:
+                    for key, value in counts.items():
+                        results[key] += value
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(options['threads'])]
+        start = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - start
+
+        book = Book.objects.get(isbn=BENCH_ISBN)
+        loans = sum(LendedBook.objects.filter(book=book).values_list('number', flat=True))
+        attempts = options['threads'] * options['requests']
+        self.stdout.write(f"{'legacy' if options['legacy'] else 'atomic'} borrow, {options['threads']} threads")
+        self.stdout.write(f'  attempts:     {attempts} in {elapsed:.2f}s ({attempts / elapsed:.0f} req/s)')
+        self.stdout.write(f"  borrowed:     {results['ok']}, unavailable: {results['unavailable']}, errors: {results['errors']}")
+        self.stdout.write(f'  copies:       {book.copies}, lended counter: {book.lended}, copies on loan: {loans}')
+        self.stdout.write(f"  oversold:     {max(0, results['ok'] - book.copies)}")
+        self.stdout.write(f"  lost updates: {results['ok'] - book.lended}")
+        self.teardown()
+
+    def setup(self, user_count, copies):
+        self.teardown()
+        Book.objects.create(isbn=BENCH_ISBN, title='Borrow benchmark', copies=copies)
+        return User.objects.bulk_create([
+            User(username=BENCH_USER.format(i), is_active=True) for i in range(user_count)
+        ])
+
+    #the borrows of the benchmark are logged like real ones: their events and rolled-up days
+    #are removed with the book, they would otherwise stay in the history and the analytics
+    def teardown(self):
+        LoanEvent.objects.filter(book_id=BENCH_ISBN).delete()
+        LoanDailyStats.objects.filter(book_id=BENCH_ISBN).delete()
+        Book.objects.filter(isbn=BENCH_ISBN).delete()
+        User.objects.filter(username__startswith=BENCH_USER.format('')).delete()
@@ -0,0 +1,128 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import connection
+
+from library.models import Genre
+from .bench_endpoints import percentile
+
+# mode: environment overriding the database settings (see settings.py)
+MODES = {
+    'connect': {'DATABASE_POOL': 'False', 'DATABASE_CONN_MAX_AGE': '0'},
+    'persistent': {'DATABASE_POOL': 'False', 'DATABASE_CONN_MAX_AGE': '600'},
+    'pool': {'DATABASE_POOL': 'True'},
+}
+
+
+class Command(BaseCommand):
+    help = ('Compares a new connection per request, persistent connections and the connection pool '
+            'at several concurrencies. Every mode runs in its own process with the settings of that mode; '
+            'a simulated request runs --queries short queries between request_started and request_finished, '
+            'like a short API call.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES))
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16, 32],
+                            help='Worker threads (one per request being served).')
+        parser.add_argument('--pool-sizes', type=int, nargs='+', default=[10],
+                            help='Pool max sizes to try in pool mode.')
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per run.')
+        parser.add_argument('--queries', type=int, default=2, help='Queries per request.')
+        parser.add_argument('--output', default='bench_db_connections.json')
+        parser.add_argument('--worker', action='store_true', help=(
+            'Internal: run one configuration in this process and print its result as JSON.'))
+
+    def handle(self, *args, **options):
+        if options['worker']:
+            self.stdout.write(json.dumps(self.run(options['concurrency'][0], options['requests'], options['queries'])))
+            return
+
+        results = []
+        for mode in options['modes']:
+            for pool_size in options['pool_sizes'] if mode == 'pool' else [None]:
+                env = {**os.environ, **MODES[mode]}
+                if pool_size:
+                    env['DATABASE_POOL_MAX_SIZE'] = str(pool_size)
+                    env['DATABASE_POOL_MIN_SIZE'] = str(min(pool_size, int(env.get('DATABASE_POOL_MIN_SIZE', 2))))
+                for concurrency in options['concurrency']:
+                    result = self.spawn(env, concurrency, options)
+                    result.update(mode=mode, pool_max_size=pool_size, concurrency=concurrency)
+                    results.append(result)
+                    label = f'{mode} (max {pool_size})' if pool_size else mode
+                    self.stdout.write(
+                        f"{label:16} x{concurrency:<3} {result['throughput_rps']:8.1f} req/s  "
+                        f"p50 {result['latency_ms']['p50']:6.2f}ms  p99 {result['latency_ms']['p99']:7.2f}ms  "
+                        f"backend connections {result['backend_connections']}"
+                    )
+
+        with open(options['output'], 'w') as f:
+            json.dump(results, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def spawn(self, env, concurrency, options):
+        command = [
+            sys.executable, sys.argv[0], 'bench_db_connections', '--worker',
+            '--concurrency', str(concurrency), '--requests', str(options['requests']),
+            '--queries', str(options['queries']),
+        ]
+        process = subprocess.run(command, env=env, capture_output=True, text=True)
+        if process.returncode:
+            raise CommandError(process.stderr)
+        return json.loads(process.stdout.strip().splitlines()[-1])
+
+    #serves the requests with concurrency threads, in the settings of the current process
+    def run(self, concurrency, requests, queries):
+        latencies = []
+        lock = threading.Lock()
+        per_thread = -(-requests // concurrency)
+        before = self.backend_connections()
+
+        def worker():
+            local = []
+            for _ in range(per_thread):
+                start = time.perf_counter()
+                request_started.send(sender=self.__class__)
+                try:
+                    for _ in range(queries):
+                        list(Genre.objects.values_list('name', flat=True)[:5])
+                finally:
+                    request_finished.send(sender=self.__class__)    # closes or returns the connection
+                local.append((time.perf_counter() - start) * 1000)
+            with lock:
+                latencies.extend(local)
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        opened = self.backend_connections() - before
+        connection.close()
+
+        return {
+            'requests': len(latencies),
+            'throughput_rps': len(latencies) / elapsed,
+            'latency_ms': {
+                'p50': percentile(latencies, 50),
+                'p95': percentile(latencies, 95),
+                'p99': percentile(latencies, 99),
+                'mean': sum(latencies) / len(latencies),
+            },
+            'backend_connections': opened,
+        }
+
+    #number of connections opened so far by the server (pg_stat_database.sessions, PostgreSQL 14+)
+    def backend_connections(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT sessions FROM pg_stat_database WHERE datname = current_database()')
+            count = cursor.fetchone()[0]
+        connection.close()
+        return count
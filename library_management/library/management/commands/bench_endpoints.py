@@ -0,0 +1,177 @@
+import json
+import random
+import resource
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from library.models import Author, Book, LendedBook, Review, Wishlist
+from .seed_benchmark_data import ISBN_PREFIX, USER_PREFIX, WORDS
+
+# name: (method, path built from a random generator and the samples, needs a logged user)
+ENDPOINTS = {
+    'home': ('get', lambda rnd, s: '/', False),
+    'catalog': ('get', lambda rnd, s: '/catalog/', False),
+    'search_books': ('get', lambda rnd, s: f'/search-books/?query={rnd.choice(WORDS)}', False),
+    'borrow_search': ('get', lambda rnd, s: f'/borrow_book_api?query={rnd.choice(WORDS)}', True),
+    'authors': ('get', lambda rnd, s: '/get_authors_api/', False),
+    'genres': ('get', lambda rnd, s: '/get_genres_api/', False),
+    'book_details': ('get', lambda rnd, s: f"/book/{rnd.choice(s['isbns'])}/", True),
+    'book_reviews': ('get', lambda rnd, s: f"/book/{rnd.choice(s['isbns'])}/reviews/", False),
+    'lended_books': ('get', lambda rnd, s: '/lended-books/', True),
+    'wishlist': ('get', lambda rnd, s: '/wishlist/', True),
+    'borrowed_books': ('get', lambda rnd, s: '/get_borrowed_books/', True),
+    'search_borrowed': ('get', lambda rnd, s: f"/search_borrowed_books/?query={rnd.choice(s['users'])[0]}", True),
+    'user_info': ('post', lambda rnd, s: '/get-user-info/', True),
+}
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+class Command(BaseCommand):
+    help = ('Drives the API endpoints with concurrent requests (in process through the Django test client, '
+            'or against a running server with --base-url) and writes latency percentiles, throughput, '
+            'query counts and peak RSS to a JSON file. Run seed_benchmark_data first.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoints', nargs='+', choices=list(ENDPOINTS), default=list(ENDPOINTS))
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint.')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--base-url', default=None, help='e.g. http://127.0.0.1:8080, in process by default.')
+        parser.add_argument('--no-cache', action='store_true', help='Disable the response cache (in process only).')
+        parser.add_argument('--output', default='bench_results.json')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        samples = self.samples()
+        caches = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}} if options['no_cache'] else None
+        results = {}
+        with override_settings(QUERY_COUNT_HEADERS=True, **({'CACHES': caches} if caches else {})):
+            for name in options['endpoints']:
+                results[name] = self.run_endpoint(name, samples, options)
+                stats = results[name]
+                self.stdout.write(
+                    f"{name:16} {stats['throughput_rps']:8.1f} req/s  "
+                    f"p50 {stats['latency_ms']['p50']:7.1f}ms  p95 {stats['latency_ms']['p95']:7.1f}ms  "
+                    f"p99 {stats['latency_ms']['p99']:7.1f}ms  queries {stats['queries']['max']}  "
+                    f"errors {stats['errors']}"
+                )
+
+        report = {
+            'started': datetime.now(timezone.utc).isoformat(),
+            'mode': options['base_url'] or 'in-process',
+            'concurrency': options['concurrency'],
+            'requests_per_endpoint': options['requests'],
+            'cache': not options['no_cache'],
+            'data': {
+                'books': Book.objects.count(),
+                'authors': Author.objects.count(),
+                'loans': LendedBook.objects.count(),
+                'reviews': Review.objects.count(),
+                'wishlist': Wishlist.objects.count(),
+            },
+            'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            'endpoints': results,
+        }
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def samples(self):
+        isbns = list(Book.objects.filter(isbn__startswith=ISBN_PREFIX).values_list('isbn', flat=True)[:1000])
+        users = list(User.objects.filter(username__startswith=USER_PREFIX)[:100])
+        if not isbns or not users:
+            raise CommandError('No benchmark data, run seed_benchmark_data first.')
+        return {
+            'isbns': isbns,
+            'users': [(user.username, str(AccessToken.for_user(user))) for user in users],
+        }
+
+    def run_endpoint(self, name, samples, options):
+        method, path, needs_user = ENDPOINTS[name]
+        latencies, queries = [], []
+        errors = 0
+        lock = threading.Lock()
+        per_thread = -(-options['requests'] // options['concurrency'])
+
+        def worker(index):
+            nonlocal errors
+            rnd = random.Random(options['seed'] * 1000 + index)
+            client = None if options['base_url'] else Client(HTTP_HOST='localhost')
+            local_latencies, local_queries, local_errors = [], [], 0
+            try:
+                for _ in range(per_thread):
+                    username, token = rnd.choice(samples['users'])
+                    headers = {'Authorization': f'Bearer {token}'} if needs_user else {}
+                    data = {'username': username} if method == 'post' else None
+                    start = time.perf_counter()
+                    status, query_count = self.request(client, options['base_url'], method, path(rnd, samples), headers, data)
+                    local_latencies.append((time.perf_counter() - start) * 1000)
+                    if status >= 400:
+                        local_errors += 1
+                    if query_count is not None:
+                        local_queries.append(query_count)
+            finally:
+                connection.close()
+                with lock:
+                    latencies.extend(local_latencies)
+                    queries.extend(local_queries)
+                    errors += local_errors
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(options['concurrency'])]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        return {
+            'requests': len(latencies),
+            'errors': errors,
+            'duration_s': elapsed,
+            'throughput_rps': len(latencies) / elapsed,
+            'latency_ms': {
+                'p50': percentile(latencies, 50),
+                'p95': percentile(latencies, 95),
+                'p99': percentile(latencies, 99),
+                'max': max(latencies),
+                'mean': sum(latencies) / len(latencies),
+            },
+            'queries': {
+                'mean': sum(queries) / len(queries) if queries else None,
+                'max': max(queries) if queries else None,
+            },
+        }
+
+    #returns the status code and the X-DB-Queries header of the response
+    def request(self, client, base_url, method, path, headers, data):
+        if client is not None:
+            response = getattr(client, method)(path, data, headers=headers)
+            query_count = response.get('X-DB-Queries')
+            return response.status_code, int(query_count) if query_count else None
+
+        body = json.dumps(data).encode() if data is not None else None
+        request = urllib.request.Request(base_url.rstrip('/') + path, data=body, method=method.upper(),
+                                         headers={**headers, 'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                status, query_count = response.status, response.headers.get('X-DB-Queries')
+        except urllib.error.HTTPError as e:
+            status, query_count = e.code, e.headers.get('X-DB-Queries')
+        return status, int(query_count) if query_count else None
@@ -0,0 +1,111 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from library.covers import cover_srcset, cover_url
+from library.models import Book, LendedBook
+from library.projections import book_cards, book_records, loan_rows
+from library.renderers import ORJSONRenderer
+from library.serializers import BookSerializer, LendedBookSerializer
+
+
+def book_instances(n):
+    return [
+        {
+            "isbn": book.isbn,
+            "title": book.title,
+            "authors": [author.name for author in book.authors.all()],
+            "cover": cover_url(book.cover.name, book.cover_variants),
+            "cover_srcset": cover_srcset(book.cover.name, book.cover_variants)
+        }
+        for book in Book.objects.order_by('isbn').prefetch_related('authors')[:n]
+    ]
+
+
+def loan_instances(n):
+    loans = LendedBook.objects.order_by('id').select_related('book', 'user').prefetch_related('book__authors')[:n]
+    return [
+        {
+            "title": loan.book.title,
+            "isbn": loan.book.isbn,
+            "authors": [author.name for author in loan.book.authors.all()],
+            "borrowed_by": loan.user.username,
+            "number": loan.number,
+            "borrowed_on": loan.borrowed_on,
+            "return_on": loan.return_on
+        }
+        for loan in loans
+    ]
+
+
+# list: path: (build the data for n rows, renderer)
+PATHS = {
+    'books': {
+        'serializer': (lambda n: BookSerializer(
+            Book.objects.order_by('isbn').prefetch_related('authors', 'genres')[:n], many=True).data, JSONRenderer),
+        'instances': (book_instances, JSONRenderer),
+        'values': (lambda n: book_cards(Book.objects.order_by('isbn')[:n]), JSONRenderer),
+        'values+orjson': (lambda n: book_cards(Book.objects.order_by('isbn')[:n]), ORJSONRenderer),
+        # the same JSON as the serializer path
+        'records+orjson': (lambda n: book_records(Book.objects.order_by('isbn')[:n]), ORJSONRenderer),
+    },
+    'loans': {
+        'serializer': (lambda n: LendedBookSerializer(
+            LendedBook.objects.order_by('id').select_related('book', 'user').prefetch_related('book__authors')[:n],
+            many=True).data, JSONRenderer),
+        'instances': (loan_instances, JSONRenderer),
+        'values': (lambda n: loan_rows(LendedBook.objects.order_by('id')[:n]), JSONRenderer),
+        'values+orjson': (lambda n: loan_rows(LendedBook.objects.order_by('id')[:n]), ORJSONRenderer),
+    },
+}
+
+
+class Command(BaseCommand):
+    help = ('Compares the CPU time of the ways to turn rows into a JSON list: nested DRF serializers, '
+            'dicts built from model instances (the list views before projections.py), values() projections '
+            'with the DRF JSONRenderer, and projections with the orjson renderer. Run seed_benchmark_data first.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lists', nargs='+', choices=list(PATHS), default=list(PATHS))
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per path, the median is reported.')
+        parser.add_argument('--output', default='bench_serializers.json')
+
+    def handle(self, *args, **options):
+        results = []
+        for name in options['lists']:
+            for path, (build, renderer) in PATHS[name].items():
+                runs = [self.run(build, renderer, options['rows']) for _ in range(options['repeat'])]
+                if runs[0]['rows'] < options['rows']:
+                    raise CommandError(f"Only {runs[0]['rows']} {name}, run seed_benchmark_data first.")
+                result = {'list': name, 'path': path, 'rows': options['rows']}
+                for measure in ('build_cpu_ms', 'render_cpu_ms', 'total_cpu_ms', 'wall_ms'):
+                    result[measure] = sorted(run[measure] for run in runs)[len(runs) // 2]
+                result['bytes'] = runs[0]['bytes']
+                results.append(result)
+                self.stdout.write(
+                    f"{name:6} {path:14} build {result['build_cpu_ms']:8.1f}ms  render {result['render_cpu_ms']:7.1f}ms  "
+                    f"CPU {result['total_cpu_ms']:8.1f}ms  wall {result['wall_ms']:8.1f}ms  per {options['rows']} rows"
+                )
+
+        with open(options['output'], 'w') as f:
+            json.dump(results, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    #CPU time of this process, so the time spent waiting for PostgreSQL is not counted
+    def run(self, build, renderer, rows):
+        wall, start = time.perf_counter(), time.process_time()
+        data = build(rows)
+        built = time.process_time()
+        body = renderer().render(data)
+        end = time.process_time()
+        return {
+            'rows': len(data),
+            'build_cpu_ms': (built - start) * 1000,
+            'render_cpu_ms': (end - built) * 1000,
+            'total_cpu_ms': (end - start) * 1000,
+            'wall_ms': (time.perf_counter() - wall) * 1000,
+            'bytes': len(body),
+        }
@@ -0,0 +1,53 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from library.covers import generate_variants, mark_variants_ready
+from library.models import Book
+
+
+class Command(BaseCommand):
+    help = ('Generates the resized WebP variants of the covers that do not have them yet '
+            '(books created before the variants existed, or imported with import_catalog).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.COVER_VARIANT_WORKERS * 2)
+        parser.add_argument('--batch-size', type=int, default=500, help='Books marked as ready per UPDATE.')
+        parser.add_argument('--all', action='store_true', help='Regenerate the variants of every cover.')
+
+    def handle(self, *args, **options):
+        books = Book.objects.exclude(cover='').exclude(cover__isnull=True)
+        if not options['all']:
+            books = books.filter(cover_variants=False)
+        isbns_by_cover = list(books.values_list('cover', 'isbn'))
+        if not isbns_by_cover:
+            self.stdout.write('Every cover already has its variants.')
+            return
+
+        # the workers are forked, they must not inherit the open database connection
+        connection.close()
+        start = time.monotonic()
+        done, failed = [], 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            futures = {executor.submit(generate_variants, cover): (cover, isbn) for cover, isbn in isbns_by_cover}
+            for future in as_completed(futures):
+                cover, isbn = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f'{isbn}: {cover}: {e}')
+                    continue
+                done.append((cover, isbn))
+                if len(done) % options['batch_size'] == 0:
+                    mark_variants_ready(done[-options['batch_size']:])
+                    self.stdout.write(f'  {len(done)}/{len(isbns_by_cover)} covers')
+        mark_variants_ready(done[len(done) - len(done) % options['batch_size']:])
+
+        elapsed = time.monotonic() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(done)} covers resized in {elapsed:.1f}s ({len(done) / max(elapsed, 1e-9):.1f}/s), {failed} failed.'
+        ))
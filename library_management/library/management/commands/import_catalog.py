@@ -0,0 +1,173 @@
+import csv
+import json
+import os
+import sys
+import time
+from itertools import islice
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from library.cache import bump_catalog_version
+from library.catalog import BookDataError, books_written, resolve_authors
+from library.models import Belong, Book, Genre, Write
+
+BOOK_FIELDS = ['title', 'copies', 'year']
+
+
+class Command(BaseCommand):
+    help = ('Imports books from a CSV or JSONL file. Each row has isbn, title, copies, year, '
+            'authors, genres and optionally cover (a file name inside --covers-dir). '
+            'In CSV files authors and genres are separated by --separator.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSONL file, "-" reads JSONL from stdin.')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default=None,
+                            help='Input format, guessed from the file extension by default.')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows inserted per transaction.')
+        parser.add_argument('--on-conflict', choices=['skip', 'update'], default='skip',
+                            help='What to do with books whose isbn already exists.')
+        parser.add_argument('--separator', default=';', help='Separator of the authors/genres lists in CSV files.')
+        parser.add_argument('--covers-dir', default=None, help='Directory containing the cover files.')
+
+    def handle(self, *args, **options):
+        self.options = options
+        fmt = options['format'] or ('csv' if options['path'].lower().endswith('.csv') else 'jsonl')
+        stream = sys.stdin if options['path'] == '-' else open(options['path'], newline='', encoding='utf-8')
+
+        start = time.monotonic()
+        totals = {'rows': 0, 'created': 0, 'updated': 0, 'skipped': 0, 'invalid': 0}
+        try:
+            rows = self.read_rows(stream, fmt)
+            while True:
+                chunk = list(islice(rows, options['chunk_size']))
+                if not chunk:
+                    break
+                for key, value in self.import_chunk(chunk).items():
+                    totals[key] += value
+                totals['rows'] += len(chunk)
+                elapsed = time.monotonic() - start
+                self.stdout.write(f"{totals['rows']} rows, {totals['rows'] / elapsed:.0f} rows/s")
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+            # bulk_create does not send the signals that invalidate the cache. The new version
+            # also makes the running workers rebuild their autocomplete index (autocomplete.py)
+            bump_catalog_version()
+
+        elapsed = time.monotonic() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {totals['rows']} rows in {elapsed:.1f}s ({totals['rows'] / max(elapsed, 1e-9):.0f} rows/s): "
+            f"{totals['created']} created, {totals['updated']} updated, "
+            f"{totals['skipped']} skipped, {totals['invalid']} invalid."
+        ))
+
+    #yields the rows one by one as dicts with authors and genres as lists
+    def read_rows(self, stream, fmt):
+        if fmt == 'csv':
+            separator = self.options['separator']
+            for row in csv.DictReader(stream):
+                row['authors'] = [name.strip() for name in (row.get('authors') or '').split(separator)]
+                row['genres'] = [name.strip() for name in (row.get('genres') or '').split(separator)]
+                yield row
+        else:
+            for number, line in enumerate(stream, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    raise CommandError(f'Invalid JSON on line {number}')
+
+    def parse_row(self, row):
+        isbn = str(row.get('isbn') or '').strip()
+        title = str(row.get('title') or '').strip()
+        if not isbn or not title or len(isbn) > 13:
+            return None
+        try:
+            copies = int(row.get('copies') or 0)
+            year = int(row.get('year') or 0)
+        except (TypeError, ValueError):
+            return None
+        return {
+            'isbn': isbn,
+            'title': title[:200],
+            'copies': max(copies, 0),
+            'year': year,
+            'authors': [name[:100] for name in row.get('authors') or [] if name],
+            'genres': [name[:100] for name in row.get('genres') or [] if name],
+            'cover': row.get('cover') or None,
+        }
+
+    def import_chunk(self, chunk):
+        counts = {'created': 0, 'updated': 0, 'skipped': 0, 'invalid': 0}
+        books = {}
+        for row in chunk:
+            parsed = self.parse_row(row)
+            if parsed is None:
+                counts['invalid'] += 1
+            elif parsed['isbn'] in books:    # the last row of a duplicated isbn wins
+                counts['skipped'] += 1
+                books[parsed['isbn']] = parsed
+            else:
+                books[parsed['isbn']] = parsed
+
+        with transaction.atomic():
+            existing = set(Book.objects.filter(isbn__in=books).values_list('isbn', flat=True))
+            if self.options['on_conflict'] == 'skip':
+                counts['skipped'] += len(existing)
+                books = {isbn: book for isbn, book in books.items() if isbn not in existing}
+            if not books:
+                return counts
+
+            try:
+                author_ids = resolve_authors({name for book in books.values() for name in book['authors']}, create=True)
+            except BookDataError as e:
+                raise CommandError(f'{e}: the import stopped, the rows of the previous chunks are imported')
+            genre_names = {name for book in books.values() for name in book['genres']}
+            Genre.objects.bulk_create([Genre(name=name) for name in genre_names], ignore_conflicts=True)
+
+            Book.objects.bulk_create(
+                [
+                    Book(isbn=isbn, cover=self.store_cover(book['cover']) if isbn not in existing else None,
+                         **{field: book[field] for field in BOOK_FIELDS})
+                    for isbn, book in books.items()
+                ],
+                update_conflicts=bool(existing),
+                update_fields=BOOK_FIELDS + ['updated_at'] if existing else None,
+                unique_fields=['isbn'] if existing else None,
+            )
+
+            # the relations of updated books are replaced by the ones in the file
+            Write.objects.filter(book_id__in=existing).delete()
+            Belong.objects.filter(book_id__in=existing).delete()
+            Write.objects.bulk_create([
+                Write(book_id=isbn, author_id=author_ids[name])
+                for isbn, book in books.items() for name in dict.fromkeys(book['authors'])
+            ])
+            Belong.objects.bulk_create([
+                Belong(book_id=isbn, genre_id=name)
+                for isbn, book in books.items() for name in dict.fromkeys(book['genres'])
+            ])
+            books_written(
+                {isbn: book['title'] for isbn, book in books.items()},
+                {author_id: name for name, author_id in author_ids.items()}, genre_names
+            )
+
+        counts['updated'] += len(existing & books.keys())
+        counts['created'] += len(books.keys() - existing)
+        return counts
+
+    #copies the cover file into the media storage and returns its name
+    def store_cover(self, filename):
+        covers_dir = self.options['covers_dir']
+        if not filename or not covers_dir:
+            return None
+        path = os.path.join(covers_dir, filename)
+        if not os.path.isfile(path):
+            self.stderr.write(f'Cover not found: {path}')
+            return None
+        with open(path, 'rb') as f:
+            return default_storage.save(os.path.join('book_covers', os.path.basename(filename)), File(f))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from library.outbox import send_pending
+from library.reminders import DAYS_AHEAD, queue_reminders
+
+
+class Command(BaseCommand):
+    help = ('Emails every user with overdue or soon due loans one digest of their loans. '
+            'Reminded loans are recorded, so the command can be rerun (e.g. daily) without duplicates.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days-ahead', type=int, default=DAYS_AHEAD,
+                            help='Also remind the loans due within this many days.')
+        parser.add_argument('--batch-users', type=int, default=500, help='Digests queued per transaction.')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Loans fetched per round trip.')
+        parser.add_argument('--send-batch-size', type=int, default=100, help='Emails sent per SMTP connection.')
+        parser.add_argument('--no-send', action='store_true',
+                            help='Only queue the digests, send_outbox delivers them.')
+        parser.add_argument('--dry-run', action='store_true', help='Count the digests without queuing them.')
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        digests, loans = queue_reminders(
+            today, options['days_ahead'], options['batch_users'], options['chunk_size'], options['dry_run']
+        )
+        action = 'would be queued' if options['dry_run'] else 'queued'
+        self.stdout.write(f'{digests} digests ({loans} loans) {action}.')
+        if options['dry_run'] or options['no_send']:
+            return
+
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = send_pending(options['send_batch_size'])
+            total_sent += sent
+            total_failed += failed
+            if sent < options['send_batch_size']:
+                break
+        self.stdout.write(self.style.SUCCESS(f'Sent {total_sent} emails, {total_failed} failed.'))
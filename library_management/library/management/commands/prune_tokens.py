@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+
+class Command(BaseCommand):
+    help = ('Deletes the expired outstanding tokens and their blacklist entries in short chunks, '
+            'unlike flushexpiredtokens which deletes them all in one transaction. '
+            'Expired tokens are rejected anyway, so they only grow the tables.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Tokens deleted per transaction.')
+        parser.add_argument('--pause', type=float, default=0,
+                            help='Seconds to wait between chunks, to leave room for the other queries.')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running and prune again every --interval seconds.')
+        parser.add_argument('--interval', type=float, default=3600)
+
+    def handle(self, *args, **options):
+        while True:
+            total = 0
+            while True:
+                deleted = self.prune_chunk(options['chunk_size'])
+                total += deleted
+                if deleted < options['chunk_size']:
+                    break
+                time.sleep(options['pause'])
+            self.stdout.write(f'Pruned {total} expired tokens.')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    #deletes up to chunk_size expired tokens, blacklist entries first (no cascade collection)
+    def prune_chunk(self, chunk_size):
+        ids = list(
+            OutstandingToken.objects.filter(expires_at__lte=timezone.now())
+            .order_by('id').values_list('id', flat=True)[:chunk_size]
+        )
+        if not ids:
+            return 0
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {BlacklistedToken._meta.db_table} WHERE token_id = ANY(%s)', [ids])
+            cursor.execute(f'DELETE FROM {OutstandingToken._meta.db_table} WHERE id = ANY(%s)', [ids])
+        return len(ids)
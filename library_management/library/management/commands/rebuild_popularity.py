@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from library.popularity import rebuild_popularity
+
+
+class Command(BaseCommand):
+    help = ('Recomputes the trending scores (see library/popularity.py) from the current loans, reviews '
+            'and wishlists. The scores are kept up to date by the write paths, run this once after the '
+            'first deployment or to repair the tables.')
+
+    def handle(self, *args, **options):
+        books = rebuild_popularity()
+        self.stdout.write(self.style.SUCCESS(f'Popularity of {books} books rebuilt.'))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from library.models import Book
+from library.search import update_search_index
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the full-text search columns of every book (run once after migrating an existing catalog).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Number of books updated per UPDATE statement.')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        start = time.monotonic()
+        updated = 0
+        chunk = []
+
+        isbns = Book.objects.order_by('isbn').values_list('isbn', flat=True)
+        for isbn in isbns.iterator(chunk_size=chunk_size):
+            chunk.append(isbn)
+            if len(chunk) == chunk_size:
+                updated += update_search_index(chunk)
+                chunk = []
+        if chunk:
+            updated += update_search_index(chunk)
+
+        elapsed = time.monotonic() - start
+        self.stdout.write(self.style.SUCCESS(f'Indexed {updated} books in {elapsed:.1f}s.'))
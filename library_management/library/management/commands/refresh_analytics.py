@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from library.analytics import RefreshInProgress, refresh_analytics
+
+
+class Command(BaseCommand):
+    help = ('Refreshes the circulation stats of the librarian analytics endpoint (see library/analytics.py). '
+            'Run it after rollup_loan_events so the borrows of the day are counted.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--blocking', action='store_true',
+                            help='Refresh without CONCURRENTLY: faster, but the endpoint waits until it is done.')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running and refresh again every --interval seconds.')
+        parser.add_argument('--interval', type=float, default=900)
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                refresh = refresh_analytics(concurrently=not options['blocking'])
+                self.stdout.write(f"Circulation stats refreshed in {refresh.duration:.2f}s.")
+            except RefreshInProgress:
+                if not options['loop']:
+                    raise CommandError('Another refresh is running.')
+                self.stdout.write('Another refresh is running, skipped.')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
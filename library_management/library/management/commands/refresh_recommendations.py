@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from library.recommendations import BLOCK_SIZE, TOP_K, refresh_recommendations
+
+
+class Command(BaseCommand):
+    help = ('Recomputes the "readers also borrowed" neighbours of the books (see library/recommendations.py). '
+            'Only the books of the readers who borrowed since the last run are recomputed, unless --full.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Recompute every book.')
+        parser.add_argument('--top-k', type=int, default=TOP_K, help='Neighbours stored per book.')
+        parser.add_argument('--block-size', type=int, default=BLOCK_SIZE,
+                            help='Books per sparse product, lower it to use less memory.')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running and refresh again every --interval seconds.')
+        parser.add_argument('--interval', type=float, default=600)
+
+    def handle(self, *args, **options):
+        while True:
+            run = refresh_recommendations(options['full'], options['top_k'], options['block_size'])
+            self.stdout.write(
+                f"{'Full' if run.full else 'Incremental'} refresh: {run.books} books recomputed, "
+                f"{run.changed} changed, in {run.duration:.1f}s."
+            )
+            if not options['loop']:
+                break
+            options['full'] = False
+            time.sleep(options['interval'])
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from library.models import Book
+from library.ratings import recompute_rating_aggregates
+
+
+class Command(BaseCommand):
+    help = 'Recomputes review_count and rating_sum of every book from the Review table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Number of books updated per UPDATE statement.')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        start = time.monotonic()
+        updated = 0
+        chunk = []
+
+        isbns = Book.objects.order_by('isbn').values_list('isbn', flat=True)
+        for isbn in isbns.iterator(chunk_size=chunk_size):
+            chunk.append(isbn)
+            if len(chunk) == chunk_size:
+                updated += recompute_rating_aggregates(chunk)
+                chunk = []
+        if chunk:
+            updated += recompute_rating_aggregates(chunk)
+
+        elapsed = time.monotonic() - start
+        self.stdout.write(self.style.SUCCESS(f'Repaired the ratings of {updated} books in {elapsed:.1f}s.'))
@@ -0,0 +1,38 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from library.loan_events import MONTHS_AHEAD, backfill, ensure_partitions, rollup
+
+
+class Command(BaseCommand):
+    help = ('Creates the monthly partitions of the loan event log and rolls the events up into the daily '
+            'circulation stats (see library/loan_events.py). By default the days since the last rollup are '
+            'recomputed.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=date.fromisoformat, help='First day to recompute (YYYY-MM-DD).')
+        parser.add_argument('--until', type=date.fromisoformat, help='Last day to recompute, today by default.')
+        parser.add_argument('--months-ahead', type=int, default=MONTHS_AHEAD,
+                            help='Partitions created in advance after the current month.')
+        parser.add_argument('--backfill', action='store_true',
+                            help='Log the current loans as borrow events first, if the log is empty.')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running and roll up again every --interval seconds.')
+        parser.add_argument('--interval', type=float, default=3600)
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            self.stdout.write(f"{backfill()} current loans logged.")
+        while True:
+            created = ensure_partitions(months_ahead=options['months_ahead'])
+            if created:
+                self.stdout.write(f"Partitions created: {', '.join(created)}.")
+            start = time.monotonic()
+            rows = rollup(options['since'], options['until'])
+            self.stdout.write(f"{rows} daily rows rolled up in {time.monotonic() - start:.1f}s.")
+            if not options['loop']:
+                break
+            options['since'] = options['until'] = None
+            time.sleep(options['interval'])
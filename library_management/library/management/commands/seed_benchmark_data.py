@@ -0,0 +1,175 @@
+import random
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from library.cache import bump_catalog_version
+from library.models import (
+    Author, Belong, Book, BookNeighbour, BookPopularity, Genre, GenrePopularity, LendedBook, LoanDailyStats, LoanEvent,
+    LoanReminder, Review, Wishlist, Write
+)
+from library.ratings import recompute_rating_aggregates
+from library.search import update_search_index
+
+# every generated row can be recognized (and deleted with --clear) by these prefixes
+ISBN_PREFIX = 'bn'
+USER_PREFIX = 'bench_user_'
+AUTHOR_PREFIX = 'Bench Author '
+GENRE_PREFIX = 'Bench Genre '
+
+WORDS = ('night', 'river', 'stone', 'garden', 'war', 'peace', 'winter', 'shadow', 'house', 'city',
+         'light', 'silence', 'sea', 'journey', 'king', 'letter', 'memory', 'storm', 'empire', 'road')
+
+
+#deletes the rows of the queryset with one DELETE, without the per-row signals (search
+#index, rating aggregates) and cascade collection of delete()
+def delete_rows(queryset):
+    meta = queryset.model._meta
+    sql, params = queryset.values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {meta.db_table} WHERE {meta.pk.column} IN ({sql})', params)
+
+
+def bench_isbn(i):
+    return f'{ISBN_PREFIX}{i:011d}'
+
+
+class Command(BaseCommand):
+    help = ('Fills the database with a synthetic catalog for the benchmarks (bench_endpoints). '
+            'The defaults are production scale: 200k books, 50k authors, 1M loans, reviews and wishlist items.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=200_000)
+        parser.add_argument('--authors', type=int, default=50_000)
+        parser.add_argument('--genres', type=int, default=30)
+        parser.add_argument('--users', type=int, default=20_000)
+        parser.add_argument('--loans', type=int, default=1_000_000)
+        parser.add_argument('--reviews', type=int, default=1_000_000)
+        parser.add_argument('--wishlist', type=int, default=1_000_000)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--clear', action='store_true', help='Only delete the generated data.')
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.random = random.Random(options['seed'])
+        self.clear()
+        if options['clear']:
+            return
+
+        start = time.monotonic()
+        genre_names = [f'{GENRE_PREFIX}{i}' for i in range(options['genres'])]
+        self.step('genres', Genre, (Genre(name=name) for name in genre_names))
+        self.step('authors', Author, (
+            Author(name=f'{AUTHOR_PREFIX}{i}') for i in range(options['authors'])
+        ))
+        author_ids = list(Author.objects.filter(name__startswith=AUTHOR_PREFIX).values_list('id', flat=True))
+        self.step('users', User, (
+            User(username=f'{USER_PREFIX}{i}', email=f'{USER_PREFIX}{i}@example.com', is_active=True)
+            for i in range(options['users'])
+        ))
+        user_ids = list(User.objects.filter(username__startswith=USER_PREFIX).order_by('id').values_list('id', flat=True))
+
+        books = options['books']
+        self.step('books', Book, (
+            Book(isbn=bench_isbn(i), title=self.title(), year=self.random.randint(1800, 2024))
+            for i in range(books)
+        ))
+        self.step('write', Write, (
+            Write(book_id=bench_isbn(i), author_id=author_id)
+            for i in range(books)
+            for author_id in self.random.sample(author_ids, self.random.choice((1, 1, 1, 2, 3)))
+        ))
+        self.step('belong', Belong, (
+            Belong(book_id=bench_isbn(i), genre_id=name)
+            for i in range(books)
+            for name in self.random.sample(genre_names, 2)
+        ))
+
+        # every user borrows/reviews/wishes distinct books, so unique_together holds
+        today = date.today()
+        self.step('loans', LendedBook, (
+            LendedBook(user_id=user_id, book_id=isbn, number=1, borrowed_on=borrowed_on,
+                       return_on=borrowed_on + timedelta(days=30))
+            for user_id, isbn in self.pairs(user_ids, books, options['loans'], offset=0)
+            for borrowed_on in [today - timedelta(days=self.random.randint(0, 60))]
+        ))
+        self.step('reviews', Review, (
+            Review(user_id=user_id, book_id=isbn, rating=self.random.randint(1, 5), content='Generated review.')
+            for user_id, isbn in self.pairs(user_ids, books, options['reviews'], offset=7)
+        ))
+        self.step('wishlist', Wishlist, (
+            Wishlist(user_id=user_id, book_id=isbn)
+            for user_id, isbn in self.pairs(user_ids, books, options['wishlist'], offset=13)
+        ))
+
+        self.stdout.write('Updating counters and search columns...')
+        self.denormalize(books)
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f'Benchmark data generated in {time.monotonic() - start:.0f}s.'))
+
+    def title(self):
+        return ' '.join(self.random.sample(WORDS, self.random.randint(2, 5))).capitalize()
+
+    #yields count (user, isbn) pairs, never the same pair twice
+    def pairs(self, user_ids, books, count, offset):
+        per_user = -(-count // len(user_ids))
+        stride = max(1, books // per_user)
+        produced = 0
+        for index, user_id in enumerate(user_ids):
+            first = (index * 7919 + offset) % books
+            for j in range(min(per_user, books)):
+                if produced == count:
+                    return
+                yield user_id, bench_isbn((first + j * stride) % books)
+                produced += 1
+
+    #inserts the rows in batches
+    def step(self, name, model, rows):
+        start = time.monotonic()
+        total = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == self.batch_size:
+                total += len(model.objects.bulk_create(batch))
+                batch = []
+        if batch:
+            total += len(model.objects.bulk_create(batch))
+        elapsed = time.monotonic() - start
+        self.stdout.write(f'  {name:9} {total:>9} rows in {elapsed:6.1f}s ({total / max(elapsed, 1e-9):.0f} rows/s)')
+
+    #fills lended/copies, the rating aggregates and the search columns of the generated books
+    def denormalize(self, books):
+        loans = LendedBook.objects.filter(book=OuterRef('pk')).values('book').annotate(count=Count('id')).values('count')
+        for first in range(0, books, self.batch_size):
+            isbns = [bench_isbn(i) for i in range(first, min(first + self.batch_size, books))]
+            Book.objects.filter(isbn__in=isbns).update(lended=Coalesce(Subquery(loans), 0))
+            Book.objects.filter(isbn__in=isbns).update(copies=F('lended') + 3)
+            recompute_rating_aggregates(isbns)
+            update_search_index(isbns)
+
+    #dependent rows first, the tables have foreign keys and delete_rows does not cascade
+    def clear(self):
+        books = Book.objects.filter(isbn__startswith=ISBN_PREFIX)
+        users = User.objects.filter(username__startswith=USER_PREFIX)
+        delete_rows(LoanReminder.objects.filter(loan__book__in=books))
+        delete_rows(LoanReminder.objects.filter(loan__user__in=users))
+        for model in (Write, Belong, LendedBook, Review, Wishlist):
+            delete_rows(model.objects.filter(book__in=books))
+        for model in (LendedBook, Review, Wishlist):
+            delete_rows(model.objects.filter(user__in=users))
+        delete_rows(BookNeighbour.objects.filter(Q(book__in=books) | Q(neighbour__in=books)))
+        for model in (BookPopularity, GenrePopularity, LoanEvent, LoanDailyStats):
+            delete_rows(model.objects.filter(book__in=books))
+        delete_rows(Write.objects.filter(author__name__startswith=AUTHOR_PREFIX))
+        delete_rows(Belong.objects.filter(genre__name__startswith=GENRE_PREFIX))
+        delete_rows(books)
+        users.delete()
+        delete_rows(Author.objects.filter(name__startswith=AUTHOR_PREFIX))
+        delete_rows(Genre.objects.filter(name__startswith=GENRE_PREFIX))
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from library.outbox import MAX_ATTEMPTS, send_pending
+
+
+class Command(BaseCommand):
+    help = 'Sends the queued emails of the outbox in batches over a single SMTP connection.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS,
+                            help='Emails that failed this many times are not retried.')
+        parser.add_argument('--backend', default=None,
+                            help='Email backend to use instead of settings.EMAIL_BACKEND.')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running and poll the outbox every --interval seconds.')
+        parser.add_argument('--interval', type=float, default=5)
+
+    def handle(self, *args, **options):
+        while True:
+            total_sent = total_failed = 0
+            while True:     # drain everything that is due
+                sent, failed = send_pending(options['batch_size'], options['max_attempts'], options['backend'])
+                total_sent += sent
+                total_failed += failed
+                if sent < options['batch_size']:  # short batch or failures: wait for the next poll
+                    break
+            if total_sent or total_failed or not options['loop']:
+                self.stdout.write(f'Sent {total_sent} emails, {total_failed} failed.')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
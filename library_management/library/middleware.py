@@ -0,0 +1,76 @@
+# Per-request SQL instrumentation.
+# Every query of the request goes through a connection execute wrapper that counts
+# it and measures its time. The totals are logged and, when QUERY_COUNT_HEADERS is
+# on (by default with DEBUG), returned in the X-DB-Queries / X-DB-Time headers.
+# The middleware is also async capable, so it does not force the async views
+# (async_views.py) back onto a worker thread.
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger('library.queries')
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+
+class QueryCountMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.headers = getattr(settings, 'QUERY_COUNT_HEADERS', settings.DEBUG)
+        self.warning = getattr(settings, 'QUERY_COUNT_WARNING', 50)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+        return self.report(request, response, counter)
+
+    #the async ORM runs the queries of a request in its own thread (sync_to_async),
+    #the counter is installed on the connection of that thread
+    async def __acall__(self, request):
+        counter = QueryCounter()
+        await sync_to_async(_add_wrapper)(counter)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(_remove_wrapper)(counter)
+        return self.report(request, response, counter)
+
+    def report(self, request, response, counter):
+        duration_ms = counter.duration * 1000
+        level = logging.WARNING if counter.count > self.warning else logging.DEBUG
+        logger.log(level, '%s %s: %d queries in %.1fms', request.method, request.path, counter.count, duration_ms)
+        if self.headers:
+            response['X-DB-Queries'] = str(counter.count)
+            response['X-DB-Time'] = f'{duration_ms:.1f}ms'
+        return response
+
+
+def _add_wrapper(counter):
+    connection.execute_wrappers.append(counter)
+
+
+def _remove_wrapper(counter):
+    connection.execute_wrappers.remove(counter)
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.2 on 2026-10-18 14:12
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0006_book_cover_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoanReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('return_on', models.DateField()),
+                ('kind', models.CharField(choices=[('due_soon', 'Due soon'), ('overdue', 'Overdue')], max_length=10)),
+                ('created_on', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='lendedbook',
+            index=models.Index(fields=['return_on'], name='lendedbook_return_on_idx'),
+        ),
+        migrations.AddField(
+            model_name='loanreminder',
+            name='email',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='library.outgoingemail'),
+        ),
+        migrations.AddField(
+            model_name='loanreminder',
+            name='loan',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='library.lendedbook'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='loanreminder',
+            unique_together={('loan', 'return_on', 'kind')},
+        ),
+    ]
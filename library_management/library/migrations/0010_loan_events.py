@@ -0,0 +1,76 @@
+# Generated by Django 5.1.2 on 2026-10-18 14:42
+
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Django cannot create a partitioned table: the state gets the model, the database gets
+# a table partitioned by month on occurred_on. The primary key of a partitioned table has
+# to contain the partition key. The monthly partitions are created by
+# loan_events.ensure_partitions (rollup_loan_events command); the default partition
+# only receives the events of a month nobody created yet.
+CREATE_LOAN_EVENTS = """
+CREATE TABLE library_loanevent (
+    id bigint GENERATED BY DEFAULT AS IDENTITY,
+    kind varchar(10) NOT NULL,
+    user_id integer NOT NULL,
+    book_id varchar(13) NOT NULL,
+    quantity integer NOT NULL CHECK (quantity >= 0),
+    due_on date NULL,
+    occurred_on timestamp with time zone NOT NULL,
+    PRIMARY KEY (id, occurred_on)
+) PARTITION BY RANGE (occurred_on);
+CREATE TABLE library_loanevent_default PARTITION OF library_loanevent DEFAULT;
+CREATE INDEX loanevent_book_idx ON library_loanevent (book_id, occurred_on);
+CREATE INDEX loanevent_user_idx ON library_loanevent (user_id, occurred_on);
+CREATE INDEX loanevent_occurred_brin ON library_loanevent USING brin (occurred_on);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0009_popularity'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoanDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('borrowed', models.PositiveIntegerField(default=0)),
+                ('returned', models.PositiveIntegerField(default=0)),
+                ('book', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='library.book')),
+            ],
+            options={
+                'unique_together': {('day', 'book')},
+            },
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='LoanEvent',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('kind', models.CharField(choices=[('borrow', 'Borrow'), ('return', 'Return')], max_length=10)),
+                        ('quantity', models.PositiveIntegerField(default=1)),
+                        ('due_on', models.DateField(blank=True, null=True)),
+                        ('occurred_on', models.DateTimeField(default=django.utils.timezone.now)),
+                        ('book', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='library.book')),
+                        ('user', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'indexes': [models.Index(fields=['book', 'occurred_on'], name='loanevent_book_idx'), models.Index(fields=['user', 'occurred_on'], name='loanevent_user_idx'), django.contrib.postgres.indexes.BrinIndex(fields=['occurred_on'], name='loanevent_occurred_brin')],
+                    },
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(CREATE_LOAN_EVENTS, 'DROP TABLE library_loanevent;'),
+            ],
+        ),
+    ]
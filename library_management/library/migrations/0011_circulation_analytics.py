@@ -0,0 +1,96 @@
+# Generated by Django 5.1.2 on 2026-10-18 14:45
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+# The stats of every book (overdue loans from LendedBook, borrows from the daily rollup of
+# the loan event log) summed per genre, author and year. A book counts once in each of
+# its genres and authors. The unique index on id lets the view be refreshed concurrently,
+# without blocking the reads. Creating the view counts as its first refresh. The 30 days
+# of borrowed_recent are analytics.RECENT_DAYS.
+CREATE_CIRCULATION_STATS = """
+CREATE MATERIALIZED VIEW library_circulationstats AS
+WITH books AS (
+    SELECT b.isbn, b.year, b.copies, b.lended, b.review_count, b.rating_sum,
+           COALESCE(o.loans, 0) AS overdue_loans, COALESCE(o.copies, 0) AS overdue_copies,
+           COALESCE(s.borrowed_recent, 0) AS borrowed_recent, COALESCE(s.returned_recent, 0) AS returned_recent,
+           COALESCE(s.borrowed_total, 0) AS borrowed_total
+    FROM library_book b
+    LEFT JOIN (
+        SELECT book_id, COUNT(*) AS loans, SUM(number) AS copies
+        FROM library_lendedbook WHERE return_on < CURRENT_DATE GROUP BY book_id
+    ) o ON o.book_id = b.isbn
+    LEFT JOIN (
+        SELECT book_id,
+               SUM(borrowed) FILTER (WHERE day > CURRENT_DATE - 30) AS borrowed_recent,
+               SUM(returned) FILTER (WHERE day > CURRENT_DATE - 30) AS returned_recent,
+               SUM(borrowed) AS borrowed_total
+        FROM library_loandailystats GROUP BY book_id
+    ) s ON s.book_id = b.isbn
+), grouped AS (
+    SELECT 'all' AS dimension, '' AS key, 'All books' AS label, books.* FROM books
+    UNION ALL
+    SELECT 'genre', g.genre_id, g.genre_id, books.* FROM books JOIN library_belong g ON g.book_id = books.isbn
+    UNION ALL
+    SELECT 'author', a.id::text, a.name, books.* FROM books
+    JOIN library_write w ON w.book_id = books.isbn JOIN library_author a ON a.id = w.author_id
+    UNION ALL
+    SELECT 'year', year::text, year::text, books.* FROM books
+)
+SELECT dimension || ':' || key AS id, dimension, key, MIN(label) AS label, COUNT(*) AS books,
+       SUM(copies)::bigint AS copies, SUM(lended)::bigint AS lended, (SUM(copies) - SUM(lended))::bigint AS available,
+       SUM(overdue_loans)::bigint AS overdue_loans, SUM(overdue_copies)::bigint AS overdue_copies,
+       SUM(borrowed_recent)::bigint AS borrowed_recent, SUM(returned_recent)::bigint AS returned_recent,
+       SUM(borrowed_total)::bigint AS borrowed_total, SUM(review_count)::bigint AS review_count,
+       COALESCE(SUM(rating_sum)::float / NULLIF(SUM(review_count), 0), 0) AS average_rating
+FROM grouped
+GROUP BY dimension, key;
+CREATE UNIQUE INDEX circulationstats_id ON library_circulationstats (id);
+CREATE INDEX circulationstats_dimension ON library_circulationstats (dimension, borrowed_recent DESC);
+INSERT INTO library_analyticsrefresh (started_on, duration, concurrent) VALUES (now(), 0, false);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0010_loan_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CirculationStats',
+            fields=[
+                ('id', models.CharField(max_length=120, primary_key=True, serialize=False)),
+                ('dimension', models.CharField(max_length=10)),
+                ('key', models.CharField(max_length=100)),
+                ('label', models.CharField(max_length=100)),
+                ('books', models.IntegerField()),
+                ('copies', models.IntegerField()),
+                ('lended', models.IntegerField()),
+                ('available', models.IntegerField()),
+                ('overdue_loans', models.IntegerField()),
+                ('overdue_copies', models.IntegerField()),
+                ('borrowed_recent', models.IntegerField()),
+                ('returned_recent', models.IntegerField()),
+                ('borrowed_total', models.IntegerField()),
+                ('review_count', models.IntegerField()),
+                ('average_rating', models.FloatField()),
+            ],
+            options={
+                'db_table': 'library_circulationstats',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='AnalyticsRefresh',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_on', models.DateTimeField(default=django.utils.timezone.now)),
+                ('duration', models.FloatField(default=0)),
+                ('concurrent', models.BooleanField(default=True)),
+            ],
+        ),
+        migrations.RunSQL(CREATE_CIRCULATION_STATS, 'DROP MATERIALIZED VIEW library_circulationstats;'),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.contrib.postgres.indexes import BrinIndex, GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from datetime import date
 from django.contrib.auth.models import User
 from dateutil.relativedelta import relativedelta
@@ -24,13 +26,35 @@ class Book(models.Model):
     copies = models.PositiveIntegerField(default=0)
     lended = models.PositiveIntegerField(default=0)
     cover = models.ImageField(upload_to='book_covers', blank=True, null=True)
+    # True once the resized WebP variants of the cover exist (see covers.py)
+    cover_variants = models.BooleanField(default=False, editable=False)
     year = models.IntegerField(default=0)
     genres = models.ManyToManyField(Genre, related_name="books", through="Belong")
     authors = models.ManyToManyField(Author, related_name="books", through="Write")
+    # Rating aggregates, updated with every review insert/delete (see signals.py)
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    # Changed with every write that changes the book page, used for ETag/Last-Modified.
+    # Writes done with update() must set it themselves.
+    updated_at = models.DateTimeField(auto_now=True)
+    # Search columns, filled from title, isbn, authors and genres by library/search.py
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
+    search_text = models.TextField(default='', blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='book_search_vector_gin'),
+            GinIndex(fields=['search_text'], name='book_search_text_trgm', opclasses=['gin_trgm_ops']),
+            models.Index(fields=['updated_at'], name='book_updated_at_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    @property
+    def average_rating(self):
+        return self.rating_sum / self.review_count if self.review_count else 0
+
 class Review(models.Model):
     id = models.AutoField(primary_key=True)
     content = models.TextField()
@@ -50,6 +74,9 @@ class LendedBook(models.Model):
 
     class Meta:
         unique_together = ("user", "book")
+        indexes = [
+            models.Index(fields=['return_on'], name='lendedbook_return_on_idx'),
+        ]
 
 class Wishlist(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -64,4 +91,153 @@ class Belong(models.Model):
 
 class Write(models.Model):
     book = models.ForeignKey(Book, on_delete=models.CASCADE)
-    author = models.ForeignKey(Author, on_delete=models.CASCADE)
\ No newline at end of file
+    author = models.ForeignKey(Author, on_delete=models.CASCADE)
+
+class OutgoingEmail(models.Model):
+    # Emails are written here in the request transaction and sent by the send_outbox command
+    subject = models.CharField(max_length=255)
+    message = models.TextField()
+    from_email = models.CharField(max_length=254)
+    recipients = models.JSONField(default=list)
+    created_on = models.DateTimeField(default=timezone.now)
+    sent_on = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default='')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['next_attempt'], name='outbox_pending_idx', condition=models.Q(sent_on__isnull=True)),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {', '.join(self.recipients)}"
+
+class LoanReminder(models.Model):
+    # One row per reminder sent by the overdue_reminders command, so reruns do not send it again.
+    # The return date is part of the key: a loan extended after a reminder gets a new one.
+    DUE_SOON = 'due_soon'
+    OVERDUE = 'overdue'
+    KIND_CHOICES = [(DUE_SOON, 'Due soon'), (OVERDUE, 'Overdue')]
+
+    loan = models.ForeignKey(LendedBook, on_delete=models.CASCADE)
+    return_on = models.DateField()
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    email = models.ForeignKey(OutgoingEmail, on_delete=models.SET_NULL, null=True, blank=True)
+    created_on = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ("loan", "return_on", "kind")
+
+class BookNeighbour(models.Model):
+    # The books most often borrowed, wishlisted or reviewed by the readers of a book,
+    # precomputed by the refresh_recommendations command (see recommendations.py)
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name="neighbours")
+    neighbour = models.ForeignKey(Book, on_delete=models.CASCADE, related_name="+")
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ("book", "rank")  # the index of the book page lookup
+
+class RecommendationRun(models.Model):
+    # One row per refresh_recommendations run; the next incremental run starts after last_loan_id
+    started_on = models.DateTimeField(default=timezone.now)
+    full = models.BooleanField(default=False)
+    last_loan_id = models.BigIntegerField(default=0)
+    books = models.PositiveIntegerField(default=0)  # books whose neighbours were recomputed
+    changed = models.PositiveIntegerField(default=0)  # ...and whose neighbours changed
+    duration = models.FloatField(default=0)    # seconds
+
+class BookPopularity(models.Model):
+    # Time-decayed popularity of a book, updated by the borrow/return/review/wishlist paths
+    # (see popularity.py). log_score only grows, so time passing never rewrites the rows;
+    # -inf until the first scored event.
+    book = models.OneToOneField(Book, on_delete=models.CASCADE, primary_key=True, related_name="popularity")
+    log_score = models.FloatField(default=float('-inf'))
+    borrows = models.PositiveIntegerField(default=0)
+    returns = models.PositiveIntegerField(default=0)
+    reviews = models.PositiveIntegerField(default=0)
+    wishes = models.PositiveIntegerField(default=0)
+    updated_on = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-log_score'], name='bookpopularity_score_idx'),
+        ]
+
+class GenrePopularity(models.Model):
+    # The log_score of the book copied for each of its genres, for the per genre ranking
+    genre = models.ForeignKey(Genre, on_delete=models.CASCADE)
+    book = models.ForeignKey(Book, on_delete=models.CASCADE)
+    log_score = models.FloatField()
+
+    class Meta:
+        unique_together = ("genre", "book")
+        indexes = [
+            models.Index(fields=['genre', '-log_score'], name='genrepopularity_score_idx'),
+        ]
+
+class LoanEvent(models.Model):
+    # Append-only log of every borrow and return, written in the transaction of the loan
+    # (see loan_events.py). LendedBook only holds the current loans; the history and the
+    # reports read this table and its daily rollup instead. The table is partitioned by
+    # month on occurred_on (migration 0010), and the events outlive their book and user.
+    BORROW = 'borrow'
+    RETURN = 'return'
+    KIND_CHOICES = [(BORROW, 'Borrow'), (RETURN, 'Return')]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name="+")
+    book = models.ForeignKey(Book, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name="+")
+    quantity = models.PositiveIntegerField(default=1)
+    due_on = models.DateField(null=True, blank=True)   # return date of the loan at the time of the event
+    occurred_on = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['book', 'occurred_on'], name='loanevent_book_idx'),
+            models.Index(fields=['user', 'occurred_on'], name='loanevent_user_idx'),
+            BrinIndex(fields=['occurred_on'], name='loanevent_occurred_brin'),
+        ]
+
+class LoanDailyStats(models.Model):
+    # Copies borrowed and returned per book and day, rolled up from LoanEvent by the
+    # rollup_loan_events command
+    day = models.DateField()
+    book = models.ForeignKey(Book, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+")
+    borrowed = models.PositiveIntegerField(default=0)
+    returned = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("day", "book")
+
+class CirculationStats(models.Model):
+    # Rows of the materialized view created by migration 0011: circulation and availability
+    # per genre, author and publication year (and 'all' for the whole catalog). Read-only,
+    # refreshed by analytics.refresh_analytics
+    id = models.CharField(max_length=120, primary_key=True)    # dimension:key
+    dimension = models.CharField(max_length=10)
+    key = models.CharField(max_length=100)
+    label = models.CharField(max_length=100)
+    books = models.IntegerField()
+    copies = models.IntegerField()
+    lended = models.IntegerField()
+    available = models.IntegerField()
+    overdue_loans = models.IntegerField()
+    overdue_copies = models.IntegerField()
+    borrowed_recent = models.IntegerField()    # copies borrowed in the last RECENT_DAYS days
+    returned_recent = models.IntegerField()
+    borrowed_total = models.IntegerField()     # since the loan event log exists
+    review_count = models.IntegerField()
+    average_rating = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'library_circulationstats'
+
+class AnalyticsRefresh(models.Model):
+    # One row per refresh of the CirculationStats view, for the staleness reported by the API
+    started_on = models.DateTimeField(default=timezone.now)
+    duration = models.FloatField(default=0)    # seconds
+    concurrent = models.BooleanField(default=True)
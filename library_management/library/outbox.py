@@ -0,0 +1,96 @@
+# Transactional email outbox.
+# Views call queue_mail() instead of send_mail(): the email is stored in the
+# OutgoingEmail table in the same transaction as the request, so nothing blocks on
+# SMTP and no email is lost or sent for a rolled back registration.
+# The send_outbox command delivers the queued emails in batches over one connection.
+from datetime import timedelta
+
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+MAX_ATTEMPTS = 5
+BACKOFF_SECONDS = 30        # doubled after every failed attempt
+MAX_BACKOFF_SECONDS = 3600
+CLAIM_SECONDS = 600         # longest time a worker may take to send its batch
+
+
+#same arguments as django.core.mail.send_mail
+def queue_mail(subject, message, from_email, recipient_list):
+    return OutgoingEmail.objects.create(
+        subject=subject,
+        message=message,
+        from_email=from_email,
+        recipients=list(recipient_list),
+    )
+
+
+def backoff(attempts):
+    return timedelta(seconds=min(BACKOFF_SECONDS * 2 ** (attempts - 1), MAX_BACKOFF_SECONDS))
+
+
+def _mark_failed(email, error):
+    email.next_attempt = timezone.now() + backoff(email.attempts)
+    email.last_error = str(error)
+
+
+#claims up to batch_size due emails: their attempt is counted and next_attempt is pushed
+#CLAIM_SECONDS ahead, so the other workers skip them. The row locks are only held for
+#this short transaction; an email claimed by a worker that died is retried after the claim
+def _claim(batch_size, max_attempts):
+    now = timezone.now()
+    with transaction.atomic():
+        emails = list(
+            OutgoingEmail.objects.select_for_update(skip_locked=True)
+            .filter(sent_on__isnull=True, attempts__lt=max_attempts, next_attempt__lte=now)
+            .order_by('next_attempt')[:batch_size]
+        )
+        if emails:
+            claimed_until = now + timedelta(seconds=CLAIM_SECONDS)
+            OutgoingEmail.objects.filter(id__in=[email.id for email in emails]).update(
+                attempts=F('attempts') + 1, next_attempt=claimed_until
+            )
+            for email in emails:
+                email.attempts += 1
+                email.next_attempt = claimed_until
+    return emails
+
+
+#sends up to batch_size due emails over a single connection and returns (sent, failed).
+#The emails are claimed first, then sent outside of any transaction, so no row lock or
+#transaction stays open during SMTP, and several workers can drain the outbox together.
+def send_pending(batch_size=100, max_attempts=MAX_ATTEMPTS, backend=None):
+    sent = failed = 0
+    emails = _claim(batch_size, max_attempts)
+    if not emails:
+        return sent, failed
+
+    connection = get_connection(backend)
+    try:
+        connection.open()
+    except Exception as e:  # SMTP server down, retry the whole batch later
+        for email in emails:
+            _mark_failed(email, e)
+        failed = len(emails)
+    else:
+        for email in emails:
+            try:
+                EmailMessage(
+                    email.subject, email.message, email.from_email, email.recipients,
+                    connection=connection
+                ).send()
+            except Exception as e:
+                _mark_failed(email, e)
+                failed += 1
+            else:
+                email.sent_on = timezone.now()
+                email.last_error = ''
+                sent += 1
+        connection.close()
+
+    with transaction.atomic():
+        OutgoingEmail.objects.bulk_update(emails, ['sent_on', 'next_attempt', 'last_error'])
+    return sent, failed
@@ -0,0 +1,60 @@
+# Keyset (cursor) pagination used by the catalog endpoints.
+# Pages are ordered by a unique column (the isbn for books), so the cursor is just
+# the key of the last row of the previous page. It is base64 encoded so the
+# frontend treats it as an opaque string and only passes it back.
+import base64
+import binascii
+
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(value):
+    return base64.urlsafe_b64encode(str(value).encode()).decode()
+
+
+#raises ValueError if the cursor was not produced by encode_cursor. urlsafe_b64decode
+#drops the characters outside the alphabet, so a garbage cursor would decode to ''
+def decode_cursor(cursor):
+    try:
+        value = base64.b64decode(cursor.encode(), altchars=b'-_', validate=True).decode()
+    except (binascii.Error, UnicodeError):
+        raise ValueError('Invalid cursor')
+    if not value:
+        raise ValueError('Invalid cursor')
+    return value
+
+
+#reads ?limit= from the request, falling back to the default and never above the maximum
+def get_page_size(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_PAGE_SIZE))
+    except (TypeError, ValueError):
+        limit = DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+#returns the rows after the cursor and the cursor of the next page (None on the last page).
+#One extra row is fetched to know if there is a next page without a COUNT query.
+def keyset_page(queryset, cursor, limit, key='isbn'):
+    if cursor:
+        queryset = queryset.filter(**{f'{key}__gt': decode_cursor(cursor)})
+    rows = list(queryset.order_by(key)[:limit + 1])
+    return _split_page(rows, limit, key)
+
+
+#same as keyset_page, for the async views
+async def akeyset_page(queryset, cursor, limit, key='isbn'):
+    if cursor:
+        queryset = queryset.filter(**{f'{key}__gt': decode_cursor(cursor)})
+    rows = [row async for row in queryset.order_by(key)[:limit + 1]]
+    return _split_page(rows, limit, key)
+
+
+def _split_page(rows, limit, key):
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last[key] if isinstance(last, dict) else getattr(last, key))
+    return rows, next_cursor
@@ -0,0 +1,135 @@
+# Trending books: a time-decayed popularity score per book.
+# Every borrow, review and wishlist addition adds its weight to the score of the book,
+# and the score halves every HALF_LIFE. Instead of decaying every row as time passes,
+# an event at time t adds weight * 2^((t - EPOCH) / HALF_LIFE): all the scores would be
+# divided by the same factor, so the ranking is the same and only the rows of the books
+# that change are written. The sum is stored as its logarithm (log_score) so it never
+# overflows; adding an event is a logaddexp in the upsert.
+# The score of each genre of a book is copied to GenrePopularity, so the top N overall
+# or in a genre is read from an index without aggregating loans. The counters
+# (borrows, returns...) are all-time totals: returned loans are deleted from LendedBook.
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Belong, BookPopularity, GenrePopularity, LendedBook, Review, Wishlist
+
+DEFAULT_LIMIT = 12
+MAX_LIMIT = 50
+HALF_LIFE = timedelta(days=7)
+EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+DECAY = math.log(2) / HALF_LIFE.total_seconds()
+
+BORROW, RETURN, REVIEW, WISH = 'borrow', 'return', 'review', 'wish'
+WEIGHTS = {BORROW: 1.0, RETURN: 0.0, REVIEW: 0.5, WISH: 0.5}     # returns are only counted
+COUNTERS = {BORROW: 'borrows', RETURN: 'returns', REVIEW: 'reviews', WISH: 'wishes'}
+
+
+def log_weight(weight, when):
+    return math.log(weight) + DECAY * (when - EPOCH).total_seconds()
+
+
+#the score of a log_score as of now: the weighted events of the last HALF_LIFE count about half
+def decayed_score(log_score, now=None):
+    if log_score == -math.inf:
+        return 0.0
+    return math.exp(log_score - log_weight(1, now or timezone.now()))
+
+
+def _logaddexp(a, b):
+    return f'GREATEST({a}, {b}) + LN(1 + EXP(-ABS({a} - {b})))'
+
+
+#adds count events of a kind to the popularity of the book, in the current transaction
+def record(isbn, event, count=1, when=None):
+    when = when or timezone.now()
+    weight = WEIGHTS[event] * count
+    counter = COUNTERS[event]
+    table = BookPopularity._meta.db_table
+    counters = {name: count if name == counter else 0 for name in COUNTERS.values()}
+
+    updates = [f'{counter} = {table}.{counter} + EXCLUDED.{counter}', 'updated_on = EXCLUDED.updated_on']
+    if weight:
+        updates.append(f'log_score = {_logaddexp(f"{table}.log_score", "EXCLUDED.log_score")}')
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} (book_id, log_score, {", ".join(counters)}, updated_on) '
+            f'VALUES (%s, %s, {", ".join(["%s"] * len(counters))}, %s) '
+            f'ON CONFLICT (book_id) DO UPDATE SET {", ".join(updates)} '
+            'RETURNING log_score',
+            [isbn, log_weight(weight, when) if weight else -math.inf, *counters.values(), when]
+        )
+        log_score = cursor.fetchone()[0]
+        if weight:
+            _copy_to_genres(cursor, [isbn])
+    return log_score
+
+
+#copies the scores of the books to the rows of their genres
+def _copy_to_genres(cursor, isbns):
+    table, belong = GenrePopularity._meta.db_table, Belong._meta.db_table
+    cursor.execute(
+        f'INSERT INTO {table} (genre_id, book_id, log_score) '
+        f'SELECT b.genre_id, b.book_id, p.log_score FROM {belong} b '
+        f'JOIN {BookPopularity._meta.db_table} p ON p.book_id = b.book_id '
+        'WHERE b.book_id = ANY(%s) AND p.log_score > %s '
+        'ON CONFLICT (genre_id, book_id) DO UPDATE SET log_score = EXCLUDED.log_score',
+        [list(isbns), -math.inf]
+    )
+
+
+#called by the signals when the genres of books change
+def sync_genres(isbns):
+    isbns = list(isbns)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {GenrePopularity._meta.db_table} g WHERE g.book_id = ANY(%s) AND NOT EXISTS '
+            f'(SELECT 1 FROM {Belong._meta.db_table} b WHERE b.book_id = g.book_id AND b.genre_id = g.genre_id)',
+            [isbns]
+        )
+        _copy_to_genres(cursor, isbns)
+
+
+#the top rows of the ranking, overall or in a genre (an index scan, no aggregate)
+def trending(limit, genre=None):
+    if genre is None:
+        queryset = BookPopularity.objects.filter(log_score__gt=-math.inf)
+    else:
+        queryset = GenrePopularity.objects.filter(genre_id=genre)
+    return queryset.order_by('-log_score').values(
+        'log_score', 'book__isbn', 'book__title', 'book__cover', 'book__cover_variants'
+    )[:limit]
+
+
+#recomputes the whole table from the current rows, for the first deployment or after a repair.
+#Loans count at their borrowed_on date; reviews and wishlists have no date, they count as of now.
+def rebuild_popularity(now=None):
+    now = now or timezone.now()
+    rows = {}
+
+    def add(isbn, event, count, when):
+        row = rows.get(isbn)
+        if row is None:
+            row = rows[isbn] = BookPopularity(book_id=isbn, updated_on=now)
+        setattr(row, COUNTERS[event], getattr(row, COUNTERS[event]) + count)
+        increment = log_weight(WEIGHTS[event] * count, when)
+        top = max(row.log_score, increment)
+        row.log_score = top + math.log1p(math.exp(-abs(row.log_score - increment)))
+
+    midnight = datetime.min.time()
+    loans = LendedBook.objects.values_list('book_id', 'number', 'borrowed_on')
+    for isbn, number, borrowed_on in loans.iterator(chunk_size=10000):
+        add(isbn, BORROW, number, datetime.combine(borrowed_on, midnight, tzinfo=dt_timezone.utc))
+    for isbn in Review.objects.values_list('book_id', flat=True).iterator(chunk_size=10000):
+        add(isbn, REVIEW, 1, now)
+    for isbn in Wishlist.objects.values_list('book_id', flat=True).iterator(chunk_size=10000):
+        add(isbn, WISH, 1, now)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {GenrePopularity._meta.db_table}')
+        cursor.execute(f'DELETE FROM {BookPopularity._meta.db_table}')
+        BookPopularity.objects.bulk_create(rows.values(), batch_size=5000)
+        _copy_to_genres(cursor, list(rows))
+    return len(rows)
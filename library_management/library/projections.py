@@ -0,0 +1,143 @@
+# values() projections for the list endpoints.
+# Building a model instance per row (and per prefetched author) costs more CPU than the
+# query itself on large lists. These functions read only the columns a list shows, as
+# dicts, and add the author (and genre) names of all the books with one more query,
+# so a list costs two or three queries whatever its size.
+# The a* functions are the same for the async views (async_views.py).
+from django.core.files.storage import default_storage
+
+from .covers import cover_srcset, cover_url
+from .models import Belong, BookNeighbour, Write
+
+BOOK_FIELDS = ('isbn', 'title', 'cover', 'cover_variants')
+NEIGHBOUR_FIELDS = tuple(f'neighbour__{field}' for field in BOOK_FIELDS)
+
+
+#names by isbn, in the order they were added to the book
+def authors_by_book(isbns):
+    authors = {}
+    if isbns:
+        for isbn, name in Write.objects.filter(book_id__in=isbns).order_by('id').values_list('book_id', 'author__name'):
+            authors.setdefault(isbn, []).append(name)
+    return authors
+
+
+async def aauthors_by_book(isbns):
+    authors = {}
+    if isbns:
+        rows = Write.objects.filter(book_id__in=isbns).order_by('id').values_list('book_id', 'author__name')
+        async for isbn, name in rows:
+            authors.setdefault(isbn, []).append(name)
+    return authors
+
+
+def genres_by_book(isbns):
+    genres = {}
+    if isbns:
+        for isbn, name in Belong.objects.filter(book_id__in=isbns).order_by('id').values_list('book_id', 'genre_id'):
+            genres.setdefault(isbn, []).append(name)
+    return genres
+
+
+#the catalog card of a book: isbn, title, authors and cover.
+#prefix is the path of the book in the rows ('book__' for the rows of loans and wishlists)
+def book_card(row, authors, prefix=''):
+    isbn, cover, variants = row[f'{prefix}isbn'], row[f'{prefix}cover'], row[f'{prefix}cover_variants']
+    return {
+        "isbn": isbn,
+        "title": row[f'{prefix}title'],
+        "authors": authors.get(isbn, []),
+        "cover": cover_url(cover, variants),
+        "cover_srcset": cover_srcset(cover, variants)
+    }
+
+
+#the books as serializers.BookSerializer renders them (every column, nested authors and genres)
+def book_records(queryset):
+    rows = list(queryset.values(
+        'isbn', 'title', 'copies', 'lended', 'cover', 'cover_variants', 'year', 'review_count', 'rating_sum',
+        'updated_at'
+    ))
+    isbns = {row['isbn'] for row in rows}
+    authors, genres = {}, {}
+    if isbns:
+        writes = Write.objects.filter(book_id__in=isbns).order_by('id')
+        for isbn, author_id, name in writes.values_list('book_id', 'author_id', 'author__name'):
+            authors.setdefault(isbn, []).append({'id': author_id, 'name': name})
+        for isbn, name in Belong.objects.filter(book_id__in=isbns).order_by('id').values_list('book_id', 'genre_id'):
+            genres.setdefault(isbn, []).append({'name': name})
+    return [
+        {
+            'isbn': row['isbn'],
+            'authors': authors.get(row['isbn'], []),
+            'genres': genres.get(row['isbn'], []),
+            'remaining_copies': row['copies'] - row['lended'],
+            'title': row['title'],
+            'copies': row['copies'],
+            'lended': row['lended'],
+            'cover': default_storage.url(row['cover']) if row['cover'] else None,
+            'cover_variants': row['cover_variants'],
+            'year': row['year'],
+            'review_count': row['review_count'],
+            'rating_sum': row['rating_sum'],
+            'updated_at': row['updated_at'],
+        }
+        for row in rows
+    ]
+
+
+#cards of the books of a Book queryset, in its order
+def book_cards(queryset):
+    rows = list(queryset.values(*BOOK_FIELDS))
+    return cards_of(rows)
+
+
+#cards of rows already read with values(*BOOK_FIELDS)
+def cards_of(rows):
+    authors = authors_by_book({row['isbn'] for row in rows})
+    return [book_card(row, authors) for row in rows]
+
+
+async def abook_cards(queryset):
+    rows = [row async for row in queryset.values(*BOOK_FIELDS)]
+    return await acards_of(rows)
+
+
+async def acards_of(rows):
+    authors = await aauthors_by_book({row['isbn'] for row in rows})
+    return [book_card(row, authors) for row in rows]
+
+
+#rows of a LendedBook queryset as the loan lists of the librarian: book, borrower and dates
+def loan_rows(queryset):
+    rows = list(queryset.values(
+        'id', 'book__isbn', 'book__title', 'user__username', 'number', 'borrowed_on', 'return_on'
+    ))
+    authors = authors_by_book({row['book__isbn'] for row in rows})
+    return [
+        {
+            "title": row['book__title'],
+            "isbn": row['book__isbn'],
+            "authors": authors.get(row['book__isbn'], []),
+            "borrowed_by": row['user__username'],
+            "number": row['number'],
+            "borrowed_on": row['borrowed_on'],
+            "return_on": row['return_on']
+        }
+        for row in rows
+    ]
+
+
+#"readers also borrowed" rows of a book (see recommendations.py), one query on the (book, rank) index
+def neighbours_of(isbn):
+    return BookNeighbour.objects.filter(book_id=isbn).order_by('rank').values(*NEIGHBOUR_FIELDS)
+
+
+def neighbour_card(row):
+    cover, variants = row['neighbour__cover'], row['neighbour__cover_variants']
+    return {
+        "isbn": row['neighbour__isbn'],
+        "title": row['neighbour__title'],
+        "cover": cover_url(cover, variants),
+        "cover_srcset": cover_srcset(cover, variants)
+    }
@@ -0,0 +1,27 @@
+# Rating aggregates stored on Book (review_count and rating_sum), so the average
+# rating can be shown without reading the Review table.
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Now
+
+from .models import Book, Review
+
+
+#adds count reviews with a total of rating points to a book (negative values remove them).
+#Runs as a single UPDATE, so it is safe with concurrent reviews.
+def apply_review_delta(isbn, count, rating):
+    Book.objects.filter(isbn=isbn).update(
+        review_count=F('review_count') + count,
+        rating_sum=F('rating_sum') + rating,
+        updated_at=Now(),
+    )
+
+
+#recomputes the aggregates of the given books from the Review table. updated_at is
+#refreshed too, so the ETags of the repaired book pages change (conditional.py)
+def recompute_rating_aggregates(isbns):
+    reviews = Review.objects.filter(book=OuterRef('pk')).values('book')
+    return Book.objects.filter(isbn__in=isbns).update(
+        review_count=Coalesce(Subquery(reviews.annotate(count=Count('id')).values('count')), 0),
+        rating_sum=Coalesce(Subquery(reviews.annotate(total=Sum('rating')).values('total')), 0),
+        updated_at=Now(),
+    )
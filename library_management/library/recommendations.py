@@ -0,0 +1,122 @@
+# "Readers also borrowed" recommendations.
+# The loans, reviews and wishlists form a sparse reader x book matrix X (weight 1 for a
+# borrowed or reviewed book, 0.5 for a wished one, at most 1 per pair). X.T @ X is the
+# book x book co-occurrence matrix: how much two books share their readers. Divided by
+# the norms of the two columns it is their cosine similarity, so very popular books do
+# not end up as the neighbours of everything. The TOP_K most similar books of each book
+# are stored in BookNeighbour, and the book page reads them with one indexed query
+# (projections.neighbours_of).
+# The refresh_recommendations command recomputes every book (full) or only the books
+# of the readers who borrowed since the last run: a new loan only changes the rows of
+# the books its reader has. Returned loans are deleted from LendedBook, so neighbours
+# learnt from them stay until a book is recomputed.
+import time
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Max
+from django.db.models.functions import Now
+from scipy import sparse
+
+from .models import Book, BookNeighbour, LendedBook, RecommendationRun, Review, Wishlist
+
+TOP_K = 10
+LOAN_WEIGHT = 1.0
+REVIEW_WEIGHT = 1.0
+WISHLIST_WEIGHT = 0.5
+BLOCK_SIZE = 2000   # books per product, bounds the memory of X.T @ X
+
+
+class Interactions:
+    def __init__(self):
+        user_ids, isbns, weights = [], [], []
+        for model, weight in ((LendedBook, LOAN_WEIGHT), (Review, REVIEW_WEIGHT), (Wishlist, WISHLIST_WEIGHT)):
+            pairs = list(model.objects.values_list('user_id', 'book_id'))
+            user_ids.extend(user_id for user_id, isbn in pairs)
+            isbns.extend(isbn for user_id, isbn in pairs)
+            weights.extend([weight] * len(pairs))
+
+        self.users, rows = np.unique(np.array(user_ids, dtype=np.int64), return_inverse=True)
+        self.books, columns = np.unique(np.array(isbns, dtype=object), return_inverse=True)
+        # the duplicates of a pair (borrowed and reviewed) are summed, then capped
+        matrix = sparse.csr_matrix(
+            (np.array(weights, dtype=np.float64), (rows, columns)), shape=(len(self.users), len(self.books))
+        )
+        np.minimum(matrix.data, 1.0, out=matrix.data)
+        self.matrix = matrix
+        self.by_book = matrix.tocsc()
+        self.norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+
+    #columns of the books read by the given users
+    def columns_of_users(self, user_ids):
+        rows = np.flatnonzero(np.isin(self.users, user_ids))
+        return np.unique(self.matrix[rows].indices)
+
+    #{isbn: [(neighbour isbn, score)]} of the given columns, best first
+    def neighbours(self, columns, k=TOP_K):
+        block = (self.by_book[:, columns].T @ self.matrix).tocsr()
+        result = {}
+        for i, column in enumerate(columns):
+            start, end = block.indptr[i], block.indptr[i + 1]
+            others = block.indices[start:end]
+            scores = block.data[start:end] / (self.norms[column] * self.norms[others])
+            keep = others != column
+            others, scores = others[keep], scores[keep]
+            if len(scores) > k:
+                top = np.argpartition(-scores, k)[:k]
+                others, scores = others[top], scores[top]
+            order = np.lexsort((others, -scores))     # best first, then by isbn
+            result[self.books[column]] = [(self.books[others[j]], float(scores[j])) for j in order]
+        return result
+
+
+#replaces the stored neighbours that changed, returns the number of books changed.
+#The updated_at of these books is refreshed so their book page ETag changes (conditional.py)
+def store_neighbours(neighbours):
+    stored = {}
+    rows = BookNeighbour.objects.filter(book_id__in=list(neighbours)).order_by('book_id', 'rank')
+    for isbn, neighbour in rows.values_list('book_id', 'neighbour_id'):
+        stored.setdefault(isbn, []).append(neighbour)
+    changed = [
+        isbn for isbn, items in neighbours.items()
+        if [neighbour for neighbour, score in items] != stored.get(isbn, [])
+    ]
+    if changed:
+        with transaction.atomic():
+            BookNeighbour.objects.filter(book_id__in=changed).delete()
+            BookNeighbour.objects.bulk_create([
+                BookNeighbour(book_id=isbn, neighbour_id=neighbour, rank=rank, score=score)
+                for isbn in changed
+                for rank, (neighbour, score) in enumerate(neighbours[isbn])
+            ], batch_size=5000)
+            Book.objects.filter(isbn__in=changed).update(updated_at=Now())
+    return len(changed)
+
+
+#recomputes the neighbours of every book (full) or of the books of the new loans and
+#returns the RecommendationRun. The first run is always full.
+def refresh_recommendations(full=False, k=TOP_K, block_size=BLOCK_SIZE):
+    start = time.monotonic()
+    previous = RecommendationRun.objects.order_by('-id').first()
+    full = full or previous is None
+    # read before the matrix, so the loans added while it is computed are in the next run
+    last_loan_id = LendedBook.objects.aggregate(last=Max('id'))['last'] or 0
+
+    interactions = Interactions()
+    if full:
+        columns = np.arange(len(interactions.books))
+    else:
+        readers = LendedBook.objects.filter(id__gt=previous.last_loan_id).values_list('user_id', flat=True)
+        columns = interactions.columns_of_users(np.array(list(readers), dtype=np.int64))
+
+    changed = 0
+    for offset in range(0, len(columns), block_size):
+        changed += store_neighbours(interactions.neighbours(columns[offset:offset + block_size], k))
+
+    return RecommendationRun.objects.create(
+        full=full,
+        last_loan_id=last_loan_id,
+        books=len(columns),
+        changed=changed,
+        duration=time.monotonic() - start,
+    )
@@ -0,0 +1,90 @@
+# Overdue and due-soon loan reminders, used by the overdue_reminders command.
+# The loans to remind are found with a range query on the return_on index and read
+# through a server-side cursor ordered by user, so every user gets one digest email
+# with all of their loans and the loans are never all loaded in memory.
+# The digests are queued in the outbox together with a LoanReminder row per loan, in
+# one transaction per batch: a rerun (or a run that crashed halfway) skips the loans
+# that were already reminded.
+from datetime import timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Exists, OuterRef, Value, When
+from django.template.loader import render_to_string
+
+from .models import LendedBook, LoanReminder, OutgoingEmail
+
+DAYS_AHEAD = 3      # loans due within this many days get a "due soon" reminder
+
+
+#returns the loans due before today + days_ahead that were not reminded yet, with their kind
+def pending_reminders(today, days_ahead=DAYS_AHEAD):
+    kind = Case(
+        When(return_on__lt=today, then=Value(LoanReminder.OVERDUE)),
+        default=Value(LoanReminder.DUE_SOON),
+    )
+    already_sent = LoanReminder.objects.filter(loan=OuterRef('pk'), return_on=OuterRef('return_on'), kind=OuterRef('kind'))
+    return (
+        LendedBook.objects.filter(return_on__lte=today + timedelta(days=days_ahead))
+        .annotate(kind=kind)
+        .filter(~Exists(already_sent))
+    )
+
+
+def render_digest(user, loans, today):
+    overdue = [loan for loan in loans if loan['kind'] == LoanReminder.OVERDUE]
+    due_soon = [loan for loan in loans if loan['kind'] == LoanReminder.DUE_SOON]
+    message = render_to_string('reminders/loan_reminder_email.html', {
+        'user': user,
+        'overdue': overdue,
+        'due_soon': due_soon,
+        'today': today,
+    })
+    subject = 'Overdue books' if overdue else 'Books to return soon'
+    return OutgoingEmail(
+        subject=f'{subject} ({len(loans)})',
+        message=message,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        recipients=[user['email']],
+    )
+
+
+#queues the digests of one batch of users and records the reminded loans, atomically
+def _queue_batch(digests):
+    with transaction.atomic():
+        emails = OutgoingEmail.objects.bulk_create([email for email, loans in digests])
+        LoanReminder.objects.bulk_create([
+            LoanReminder(loan_id=loan['id'], return_on=loan['return_on'], kind=loan['kind'], email=email)
+            for email, (_, loans) in zip(emails, digests) for loan in loans
+        ])
+
+
+#queues one digest per user with pending reminders. The users are processed batch_users
+#at a time, the loans are fetched chunk_size rows per round trip.
+#Returns (number of digests, number of loans); with dry_run nothing is written.
+def queue_reminders(today, days_ahead=DAYS_AHEAD, batch_users=500, chunk_size=2000, dry_run=False):
+    loans = (
+        pending_reminders(today, days_ahead)
+        .order_by('user_id', 'return_on', 'id')
+        .values('id', 'user_id', 'user__username', 'user__first_name', 'user__email',
+                'book__title', 'book__isbn', 'number', 'return_on', 'kind')
+    )
+    digest_count = loan_count = 0
+    batch = []
+    for user_id, user_loans in groupby(loans.iterator(chunk_size=chunk_size), key=lambda loan: loan['user_id']):
+        user_loans = list(user_loans)
+        first = user_loans[0]
+        if not first['user__email']:
+            continue
+        user = {'username': first['user__username'], 'first_name': first['user__first_name'], 'email': first['user__email']}
+        batch.append((render_digest(user, user_loans, today), user_loans))
+        digest_count += 1
+        loan_count += len(user_loans)
+        if len(batch) == batch_users:
+            if not dry_run:
+                _queue_batch(batch)
+            batch = []
+    if batch and not dry_run:
+        _queue_batch(batch)
+    return digest_count, loan_count
@@ -0,0 +1,48 @@
+# orjson renderer for the large list endpoints.
+# DRF's JSONRenderer goes through json.dumps and its encoder for every value, which is
+# most of the CPU time of a list of a few thousand rows once the rows are plain dicts
+# (see projections.py). orjson writes the same JSON natively; the few types it does not
+# know (Decimal, lazy translations, querysets...) are converted like in DRF's encoder.
+from datetime import timedelta
+from decimal import Decimal
+
+import orjson
+from django.utils.functional import Promise
+from rest_framework.renderers import BaseRenderer, BrowsableAPIRenderer
+
+OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS     # "Z" for UTC like DRF
+
+
+def _default(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, Promise):
+        return str(obj)
+    if isinstance(obj, timedelta):
+        return str(obj.total_seconds())
+    if isinstance(obj, bytes):
+        return obj.decode()
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    if hasattr(obj, '__iter__'):    # querysets, sets
+        return list(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def dumps(data):
+    return orjson.dumps(data, default=_default, option=OPTIONS)
+
+
+class ORJSONRenderer(BaseRenderer):
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return dumps(data)
+
+
+# for @renderer_classes, the browsable API stays available like with the default renderers
+FAST_RENDERERS = [ORJSONRenderer, BrowsableAPIRenderer]
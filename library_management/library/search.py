@@ -0,0 +1,84 @@
+# Full-text search over the catalog (PostgreSQL).
+# Every book keeps a weighted tsvector (title and isbn > authors > genres) and a
+# lowercase copy of the same text, indexed with GIN (tsvector and pg_trgm).
+# The search matches word prefixes through the tsvector, and any substring through
+# the trigram index, so the results are the same as the old icontains queries
+# without scanning the joined author/genre rows.
+# The columns are kept up to date by the signals in signals.py.
+import re
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F, OuterRef, Q, Subquery, TextField, Value
+from django.db.models.functions import Coalesce, Concat, Lower, Now
+
+from .models import Belong, Book, Write
+
+SEARCH_CONFIG = 'simple'    # names and titles should not be stemmed
+
+
+def _names_subquery(through, field):
+    names = (
+        through.objects.filter(book=OuterRef('pk'))
+        .values('book')
+        .annotate(names=StringAgg(field, ' '))
+        .values('names')
+    )
+    return Coalesce(Subquery(names), Value(''), output_field=TextField())
+
+
+#recomputes the search columns of the given books with a single UPDATE.
+#It is called whenever the text of a book changes, so it also refreshes updated_at.
+def update_search_index(isbns):
+    authors = _names_subquery(Write, 'author__name')
+    genres = _names_subquery(Belong, 'genre__name')
+    return Book.objects.filter(isbn__in=isbns).update(
+        search_vector=(
+            SearchVector('title', weight='A', config=SEARCH_CONFIG) +
+            SearchVector('isbn', weight='A', config=SEARCH_CONFIG) +
+            SearchVector(authors, weight='B', config=SEARCH_CONFIG) +
+            SearchVector(genres, weight='C', config=SEARCH_CONFIG)
+        ),
+        search_text=Lower(Concat(
+            'title', Value(' '), 'isbn', Value(' '), authors, Value(' '), genres,
+            output_field=TextField()
+        )),
+        updated_at=Now(),
+    )
+
+
+#turns the user input into a prefix tsquery: "harry pot" -> "harry:* & pot:*"
+def _prefix_query(query):
+    terms = re.findall(r'\w+', query)
+    if not terms:
+        return None
+    return SearchQuery(' & '.join(f'{term}:*' for term in terms), search_type='raw', config=SEARCH_CONFIG)
+
+
+#returns the books matching the query (title, isbn, author or genre), best matches first
+def search_catalog(query, queryset=None):
+    if queryset is None:
+        queryset = Book.objects.all()
+    query = (query or '').strip()
+    if not query:
+        return queryset.order_by('title')
+
+    if connection.vendor != 'postgresql':
+        return queryset.filter(
+            Q(title__icontains=query) |
+            Q(isbn__icontains=query) |
+            Q(authors__name__icontains=query) |
+            Q(genres__name__icontains=query)
+        ).distinct()
+
+    search_query = _prefix_query(query)
+    matches = Q(search_text__contains=query.lower())
+    if search_query is None:
+        return queryset.filter(matches).order_by('title')
+
+    return (
+        queryset.filter(matches | Q(search_vector=search_query))
+        .annotate(rank=SearchRank(F('search_vector'), search_query))
+        .order_by('-rank', 'title')
+    )
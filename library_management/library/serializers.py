@@ -24,7 +24,7 @@ class BookSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Book
-        fields = '__all__'
+        exclude = ('search_vector', 'search_text')
 
     def get_remaining_copies(self, obj):
         return obj.copies - obj.lended
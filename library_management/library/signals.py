@@ -0,0 +1,136 @@
+# Signal handlers that keep the denormalized data on Book in sync with its relations,
+# and the in-process caches in sync with the rows they copy.
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .authentication import forget_user
+from .autocomplete import index_entry, unindex_entry
+from .cache import bump_catalog_version
+from .models import Author, Belong, Book, Genre, GenrePopularity, Review, Write
+from .popularity import sync_genres
+from .ratings import apply_review_delta
+from .search import update_search_index
+
+
+# any change to the catalog invalidates the cached lists (see cache.py)
+@receiver([post_save, post_delete], sender=Book)
+@receiver([post_save, post_delete], sender=Author)
+@receiver([post_save, post_delete], sender=Genre)
+@receiver([post_save, post_delete], sender=Write)
+@receiver([post_save, post_delete], sender=Belong)
+@receiver(m2m_changed, sender=Book.authors.through)
+@receiver(m2m_changed, sender=Book.genres.through)
+def catalog_changed(sender, **kwargs):
+    if kwargs.get('action', 'post_').startswith('post_'):  # m2m_changed also sends pre_*
+        bump_catalog_version()
+
+
+@receiver(post_save, sender=Book)
+def book_saved(sender, instance, update_fields=None, **kwargs):
+    # saves that only touch copies/lended/cover do not change the search text
+    if update_fields is not None and not {'title', 'isbn'} & set(update_fields):
+        return
+    update_search_index([instance.isbn])
+
+
+@receiver(post_save, sender=Write)
+@receiver(post_delete, sender=Write)
+@receiver(post_save, sender=Belong)
+@receiver(post_delete, sender=Belong)
+def book_relation_changed(sender, instance, **kwargs):
+    update_search_index([instance.book_id])
+
+
+# book.authors.add()/book.genres.set() create the through rows without post_save
+@receiver(m2m_changed, sender=Book.authors.through)
+@receiver(m2m_changed, sender=Book.genres.through)
+def book_m2m_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':   # author.books.clear(): remember the books first
+        instance._cleared_isbns = list(instance.books.values_list('isbn', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        update_search_index([instance.pk])
+    elif action == 'post_clear':
+        update_search_index(getattr(instance, '_cleared_isbns', []))
+    else:           # author.books.add(...) / genre.books.add(...)
+        update_search_index(pk_set)
+
+
+# the per genre ranking follows the genres of the books (see popularity.py)
+@receiver(post_save, sender=Belong)
+@receiver(post_delete, sender=Belong)
+def book_genre_changed(sender, instance, **kwargs):
+    sync_genres([instance.book_id])
+
+
+@receiver(m2m_changed, sender=Book.genres.through)
+def book_genres_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        sync_genres([instance.pk])
+    elif action == 'post_clear':    # genre.books.clear()
+        GenrePopularity.objects.filter(genre=instance).delete()
+    else:
+        sync_genres(pk_set)
+
+
+@receiver(post_save, sender=Author)
+def author_saved(sender, instance, created, **kwargs):
+    if not created:     # a renamed author changes the text of all their books
+        update_search_index(instance.books.values('isbn'))
+
+
+@receiver(pre_save, sender=Review)
+def review_saving(sender, instance, **kwargs):
+    # an edited review (admin) replaces its old rating in the book aggregates
+    instance._old_rating = None
+    if instance.pk:
+        instance._old_rating = Review.objects.filter(pk=instance.pk).values_list('rating', flat=True).first()
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, **kwargs):
+    if created or instance._old_rating is None:
+        apply_review_delta(instance.book_id, 1, int(instance.rating))
+    else:
+        apply_review_delta(instance.book_id, 0, int(instance.rating) - instance._old_rating)
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    apply_review_delta(instance.book_id, -1, -int(instance.rating))
+
+
+# the authentication cache must not keep serving a changed or deleted user
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    forget_user(instance.pk)
+
+
+# the autocomplete index of this worker, once the change is committed.
+# The popularity of the entry is kept, it is refreshed by the periodic rebuild
+@receiver(post_save, sender=Book)
+def book_autocomplete(sender, instance, **kwargs):
+    transaction.on_commit(lambda: index_entry(('title', instance.isbn), instance.title, isbn=instance.isbn))
+
+
+@receiver(post_save, sender=Author)
+def author_autocomplete(sender, instance, **kwargs):
+    transaction.on_commit(lambda: index_entry(('author', instance.pk), instance.name))
+
+
+@receiver(post_save, sender=Genre)
+def genre_autocomplete(sender, instance, **kwargs):
+    transaction.on_commit(lambda: index_entry(('genre', instance.pk), instance.name))
+
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Genre)
+def autocomplete_deleted(sender, instance, **kwargs):
+    kind = {Book: 'title', Author: 'author', Genre: 'genre'}[sender]
+    transaction.on_commit(lambda: unindex_entry((kind, instance.pk)))
@@ -0,0 +1,73 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from library.models import Author, Belong, Book, Genre, LendedBook, Review, Wishlist, Write
+from library.search import update_search_index
+
+PREFIX = 'qb'       # isbns and usernames of the seeded rows
+SIZES = (5, 50)     # numbers of books, loans, wishlist items and reviews seeded
+
+# (method, url, number of queries). The number of queries must be the same for every
+# catalog size: a view that grows with the data is an N+1.
+ENDPOINTS = [
+    ('get', '/', 2),
+    ('get', '/catalog/', 2),
+    ('get', f'/search-books/?query={PREFIX}', 2),
+    ('get', f'/borrow_book_api?query={PREFIX}', 3),
+    ('get', '/get_authors_api/', 1),
+    ('get', '/get_genres_api/', 1),
+    ('get', f'/book/{PREFIX}0000000000/', 9),
+    ('get', f'/book/{PREFIX}0000000000/reviews/', 3),
+    ('get', '/lended-books/', 3),
+    ('get', '/wishlist/', 2),
+    ('get', '/my-account/', 4),
+    ('get', '/trending/', 2),
+    ('get', '/analytics/circulation/?dimension=author', 2),
+    ('get', '/get_borrowed_books/', 2),
+    ('get', f'/search_borrowed_books/?query={PREFIX}', 2),
+    ('post', '/get-user-info/', 1),
+]
+
+
+def seed(size):
+    user = User.objects.create(username=f'{PREFIX}_reader', is_staff=True)
+    reviewers = User.objects.bulk_create([User(username=f'{PREFIX}_reviewer{i}') for i in range(size)])
+    genres = Genre.objects.bulk_create([Genre(name=f'{PREFIX} genre {i}') for i in range(2)])
+    authors = Author.objects.bulk_create([Author(name=f'{PREFIX} author {i}') for i in range(size + 1)])
+    books = Book.objects.bulk_create([
+        Book(isbn=f'{PREFIX}{i:010d}', title=f'{PREFIX} book {i}', copies=size, lended=1)
+        for i in range(size)
+    ])
+    Write.objects.bulk_create(
+        [Write(book=book, author=authors[i]) for i, book in enumerate(books)] +
+        [Write(book=book, author=authors[i + 1]) for i, book in enumerate(books)]
+    )
+    Belong.objects.bulk_create([Belong(book=book, genre=genre) for book in books for genre in genres])
+    LendedBook.objects.bulk_create([LendedBook(user=user, book=book) for book in books])
+    Wishlist.objects.bulk_create([Wishlist(user=user, book=book) for book in books])
+    Review.objects.bulk_create([
+        Review(book=books[0], user=reviewer, rating=4, content='seeded') for reviewer in reviewers
+    ])
+    # bulk_create does not send signals, fill the search columns the views rely on
+    update_search_index([book.isbn for book in books])
+    return user
+
+
+#the cache is disabled so that the queries of the views are counted, not the cache
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class QueryBudgetTests(TestCase):
+    def test_endpoints_run_the_same_queries_whatever_the_size(self):
+        for size in SIZES:
+            with transaction.atomic():
+                user = seed(size)
+                client = APIClient(HTTP_HOST='localhost')
+                client.force_authenticate(user)
+                for method, url, queries in ENDPOINTS:
+                    data = {'username': user.username} if method == 'post' else None
+                    with self.subTest(size=size, url=url):
+                        with self.assertNumQueries(queries):
+                            response = getattr(client, method)(url, data)
+                        self.assertEqual(response.status_code, 200)
+                transaction.set_rollback(True)
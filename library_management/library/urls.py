@@ -3,12 +3,14 @@ from django.urls import path
 from django.contrib.auth.views import LoginView
 from django.contrib.auth.views import LogoutView
 from .views import *
+from . import async_views
 from rest_framework_simplejwt import views as jwt_views
 from django.conf.urls.static import static
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', ReactView.as_view(), name='book-list'),
+    path('catalog/', catalog_api, name='catalog_api'),
     path('logout/', LogoutView.as_view(next_page='login'), name='logout'),
     path('token/', 
           jwt_views.TokenObtainPairView.as_view(), 
@@ -19,16 +21,20 @@ urlpatterns = [
      path('get-user-info/', get_user_info, name='get_user_info'),
     path('lended-books/', get_lended_books, name='lended_books'),
     path('wishlist/', get_wishlist, name='wishlist'),
+    path('my-account/', get_my_account, name='my_account'),
     path('register/', register_user, name='register_user'),
     path('verify-email/<uidb64>/<token>/', verify_email, name='verify_email'),
     path('borrow_book_api', borrow_book_api, name='borrow_book_api'),
     path('get_borrowed_books/', get_borrowed_books, name='get_borrowed_books'),
+    path('export_borrowed_books/', export_borrowed_books, name='export_borrowed_books'),
     path('search_borrowed_books/', search_borrowed_books, name='search_borrowed_books'),
     path('return_book_api/', return_book_api, name='return_book_api'),
     path('add_book_api/', add_book_api, name='add_book_api'),
     path('get_authors_api/', get_authors_api, name='get_authors_api'),
     path('get_genres_api/', get_genres_api, name='get_genres_api'),
+    path('cache-stats/', get_cache_stats, name='cache_stats'),
     path('book/<str:isbn>/', get_book_details, name='get_book_details'),
+    path('book/<str:isbn>/reviews/', get_book_reviews, name='get_book_reviews'),
     path('toggle_wishlist/<str:isbn>/', toggle_wishlist, name='toggle_wishlist'),
     path('add_review/<str:isbn>/', add_review, name='add_review'),
     path('delete_review/<str:isbn>/<int:review_id>/', delete_review, name='delete_review'),
@@ -38,5 +44,15 @@ urlpatterns = [
     path('delete-account-api/', delete_account_api, name='delete_account_api'),
     path('resend-verification/', resend_verification_email, name='resend_verification'),
     path('search-books/', search_books, name='search_books'),
+    path('autocomplete/', autocomplete_api, name='autocomplete'),
+    path('trending/', trending_api, name='trending'),
+    path('analytics/circulation/', circulation_analytics, name='circulation_analytics'),
+    path('analytics/circulation/refresh/', refresh_circulation_analytics, name='refresh_circulation_analytics'),
+    # async versions of the read endpoints, for ASGI servers (see async_views.py)
+    path('async/catalog/', async_views.catalog_api, name='async_catalog_api'),
+    path('async/get_authors_api/', async_views.get_authors_api, name='async_get_authors_api'),
+    path('async/get_genres_api/', async_views.get_genres_api, name='async_get_genres_api'),
+    path('async/book/<str:isbn>/', async_views.get_book_details, name='async_get_book_details'),
+    path('async/search-books/', async_views.search_books, name='async_search_books'),
 ]
 urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
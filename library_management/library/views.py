@@ -9,10 +9,9 @@ from rest_framework.views import APIView
 from .models import *
 from rest_framework.response import Response
 from .serializers import * 
-from rest_framework.permissions import IsAuthenticated
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from django.contrib.auth.models import User
-from django.core.mail import send_mail
 from django.conf import settings
 from django.template.loader import render_to_string
 from django.utils.http import urlsafe_base64_encode
@@ -21,24 +20,58 @@ from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_decode
 from django.contrib.auth import get_user_model
 from django.db.models import Q
-from datetime import date
-from dateutil.relativedelta import relativedelta
+from django.db import DataError, IntegrityError, transaction
 import json
-from django.db.models import Avg
+from .pagination import get_page_size, keyset_page
+from .search import search_catalog
+from .circulation import BookUnavailable, borrow_book, return_loan
+from .outbox import queue_mail
+from .catalog import BookDataError, add_books
+from .cache import cache_stats, cached_json
+from .conditional import book_etag, book_last_modified, catalog_etag, conditional, reviews_etag
+from .covers import cover_srcset, cover_url
+from .projections import (
+    BOOK_FIELDS, authors_by_book, book_card, book_cards, cards_of, genres_by_book, loan_rows, neighbour_card,
+    neighbours_of
+)
+from .renderers import FAST_RENDERERS
+from .popularity import (
+    DEFAULT_LIMIT as TRENDING_LIMIT, MAX_LIMIT as TRENDING_MAX_LIMIT, REVIEW, WISH, decayed_score, record,
+    trending
+)
+from .exports import EXPORT_FORMATS
+from .analytics import (
+    DEFAULT_LIMIT as ANALYTICS_LIMIT, DIMENSIONS, MAX_LIMIT as ANALYTICS_MAX_LIMIT, ORDERINGS, RECENT_DAYS,
+    RefreshInProgress, circulation_stats, freshness, refresh_analytics
+)
+from .autocomplete import DEFAULT_LIMIT as AUTOCOMPLETE_LIMIT, MAX_LIMIT as AUTOCOMPLETE_MAX_LIMIT, autocomplete
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.decorators import method_decorator
 
 #This view returns the book data to the homepage
 class ReactView(APIView):
+    @method_decorator(conditional(etag_func=catalog_etag))
     def get(self, request):
-        output = [
-            {
-                "isbn": output.isbn,
-                "title": output.title,
-                "authors": output.authors.all().values_list('name', flat=True),
-                "cover": output.cover.url
-            }
-            for output in Book.objects.all()
-        ]
-        return Response(output)
+        return cached_json('books', lambda: book_cards(Book.objects.all()))
+
+#This view returns one page of the homepage catalog, ordered by isbn.
+#The "next" cursor is sent back as ?cursor= to load the following page (infinite scroll),
+#so the response size does not grow with the number of books in the library
+@api_view(['GET'])
+@conditional(etag_func=catalog_etag)
+def catalog_api(request):
+    cursor = request.GET.get('cursor') or ''
+    limit = get_page_size(request)
+
+    def build():
+        books, next_cursor = keyset_page(Book.objects.values(*BOOK_FIELDS), cursor, limit)
+        return {'results': cards_of(books), 'next': next_cursor}
+
+    try:
+        return cached_json('catalog', build, cursor, limit)
+    except ValueError:
+        return Response({'error': 'Invalid cursor'}, status=400)
 
 #This view returns the user data to the navbar
 @api_view(['POST'])
@@ -62,42 +95,87 @@ def get_user_info(request):
 
 #this view returns the list of books that the user borrowed
 @api_view(['GET'])
+@renderer_classes(FAST_RENDERERS)
 def get_lended_books(request):
-    user = request.user
-    lended_books = LendedBook.objects.filter(user=user)
+    loans = list(LendedBook.objects.filter(user=request.user).values(
+        *(f'book__{field}' for field in BOOK_FIELDS), 'number', 'borrowed_on', 'return_on'
+    ))
+    isbns = {row['book__isbn'] for row in loans}
+    authors, genres = authors_by_book(isbns), genres_by_book(isbns)
     output = [
         {
-            "title": lended_book.book.title,
-            "isbn": lended_book.book.isbn,
-            "cover": lended_book.book.cover.url if lended_book.book.cover else None,
-            "genres": lended_book.book.genres.all().values_list('name', flat=True),
-            "authors": lended_book.book.authors.all().values_list('name', flat=True),
-            "number": lended_book.number,
-            "borrowed_on": lended_book.borrowed_on,
-            "return_on": lended_book.return_on
+            **book_card(row, authors, 'book__'),
+            "genres": genres.get(row['book__isbn'], []),
+            "number": row['number'],
+            "borrowed_on": row['borrowed_on'],
+            "return_on": row['return_on']
         }
-        for lended_book in lended_books
+        for row in loans
     ]
     return Response(output)
 
 #this view returns the list of books that the user inserted in the wishlist
 @api_view(['GET'])
+@renderer_classes(FAST_RENDERERS)
 def get_wishlist(request):
+    items = list(Wishlist.objects.filter(user=request.user).values(*(f'book__{field}' for field in BOOK_FIELDS)))
+    authors = authors_by_book({row['book__isbn'] for row in items})
+    return Response([book_card(row, authors, 'book__') for row in items])
+
+#this view returns the account page data of the logged user in one request: profile, loans and wishlist.
+#?fields=loans,wishlist returns only the listed sections. The number of queries does not depend
+#on the number of books: one projection per list, then the authors and genres of all the books at once
+ACCOUNT_SECTIONS = ('profile', 'loans', 'wishlist')
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_my_account(request):
     user = request.user
-    wishlist_items = Wishlist.objects.filter(user=user)
-    output = [
-        {
-            "cover": wishlist_item.book.cover.url if wishlist_item.book.cover else None,
-            "title": wishlist_item.book.title,
-            "isbn": wishlist_item.book.isbn,
-            "authors": wishlist_item.book.authors.all().values_list('name', flat=True)
+    fields = request.GET.get('fields')
+    sections = [field.strip() for field in fields.split(',')] if fields else list(ACCOUNT_SECTIONS)
+    unknown = [section for section in sections if section not in ACCOUNT_SECTIONS]
+    if unknown:
+        return Response({'error': f"Unknown fields: {', '.join(unknown)}"}, status=400)
+
+    book_fields = [f'book__{field}' for field in BOOK_FIELDS]
+    loans = wishlist = []
+    if 'loans' in sections:
+        loans = list(LendedBook.objects.filter(user=user).order_by('id').values(
+            *book_fields, 'number', 'borrowed_on', 'return_on'
+        ))
+    if 'wishlist' in sections:
+        wishlist = list(Wishlist.objects.filter(user=user).order_by('id').values(*book_fields))
+
+    authors = authors_by_book({row['book__isbn'] for row in loans + wishlist})
+    genres = genres_by_book({row['book__isbn'] for row in loans})
+
+    output = {}
+    if 'profile' in sections:
+        output['profile'] = {
+            'username': user.username,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'email': user.email,
+            'staff': user.is_staff,
+            'superuser': user.is_superuser,
         }
-        for wishlist_item in wishlist_items
-    ]
+    if 'loans' in sections:
+        output['loans'] = [
+            {
+                **book_card(row, authors, 'book__'),
+                "genres": genres.get(row['book__isbn'], []),
+                "number": row['number'],
+                "borrowed_on": row['borrowed_on'],
+                "return_on": row['return_on'],
+            }
+            for row in loans
+        ]
+    if 'wishlist' in sections:
+        output['wishlist'] = [book_card(row, authors, 'book__') for row in wishlist]
     return Response(output)
 
 #this view handles the registration, and if the user is registered successfully
-#it sends a verification email to the user
+#it queues a verification email for the user
 @api_view(['POST'])
 def register_user(request):
     first_name = request.data.get('first_name')
@@ -110,25 +188,27 @@ def register_user(request):
         return Response({'error': 'Username already exists'}, status=400)
 
     try:
-        user = User.objects.create_user(
-            username=username,
-            email=email,
-            password=password,
-            first_name=first_name,
-            last_name=last_name
-        )
-        user.is_active = False
-        user.save()
+        # The user and the verification email are saved together, the email is sent by send_outbox
+        with transaction.atomic():
+            user = User.objects.create_user(
+                username=username,
+                email=email,
+                password=password,
+                first_name=first_name,
+                last_name=last_name
+            )
+            user.is_active = False
+            user.save()
 
-        # Send verification email
-        subject = 'Verify your email'
-        message = render_to_string('registration/verification_email.html', {
-            'user': user,
-            'domain': request.get_host(),
-            'uid': urlsafe_base64_encode(force_bytes(user.pk)),
-            'token': default_token_generator.make_token(user),
-        })
-        send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
+            # Queue verification email
+            subject = 'Verify your email'
+            message = render_to_string('registration/verification_email.html', {
+                'user': user,
+                'domain': request.get_host(),
+                'uid': urlsafe_base64_encode(force_bytes(user.pk)),
+                'token': default_token_generator.make_token(user),
+            })
+            queue_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
 
         return Response({'message': 'User registered successfully. Please check your email to verify your account.'}, status=201)
     except Exception as e:
@@ -159,15 +239,11 @@ def verify_email(request, uidb64, token):
 def borrow_book_api(request):
     if request.method == 'GET':
         search_query = request.GET.get('query')
-        books = Book.objects.filter(
-            Q(title__icontains=search_query) |
-            Q(isbn__iexact=search_query) |
-            Q(authors__name__icontains=search_query) |
-            Q(genres__name__icontains=search_query)
-        ).distinct()
+        books = search_catalog(search_query).prefetch_related('authors', 'genres')
         book_data = [
             {
-                'cover': book.cover.url if book.cover else None,
+                'cover': cover_url(book.cover.name, book.cover_variants),
+                'cover_srcset': cover_srcset(book.cover.name, book.cover_variants),
                 'title': book.title,
                 'isbn': book.isbn,
                 'authors': [author.name for author in book.authors.all()],
@@ -181,51 +257,39 @@ def borrow_book_api(request):
 
     elif request.method == 'POST':
         book_id = request.data.get('book_id')
-        book = get_object_or_404(Book, isbn=book_id)
-
-        if book.copies > book.lended:
-            book.lended += 1
-            book.save()
-            borrowed_book, created = LendedBook.objects.get_or_create(
-                user=request.user,
-                book=book,
-                defaults={
-                    'number': 1,
-                    'borrowed_on': date.today(),
-                    'return_on': date.today() + relativedelta(months=1),
-                }
-            )
-            if not created:
-                borrowed_book.number += 1
-            borrowed_book.save()
-
-            Wishlist.objects.filter(user=request.user, book=book).delete()
-
-            return Response({'message': f"You have successfully borrowed '{book.title}'."}, status=200)
-        else:
+        try:
+            title = borrow_book(request.user, book_id)
+        except Book.DoesNotExist:
+            return Response({'error': 'Book not found'}, status=404)
+        except BookUnavailable:
             return Response({'error': "Sorry, this book is currently unavailable for borrowing."}, status=400)
 
+        return Response({'message': f"You have successfully borrowed '{title}'."}, status=200)
+
 #returns the list of all books borrowed by all users
 @api_view(['GET'])
+@renderer_classes(FAST_RENDERERS)
 def get_borrowed_books(request):
-    borrowed_books = LendedBook.objects.select_related('book', 'user').all()
-    output = [
-        {
-            "title": book.book.title,
-            "isbn": book.book.isbn,
-            "authors": book.book.authors.all().values_list('name', flat=True),
-            "borrowed_by": book.user.username,
-            "number": book.number,
-            "borrowed_on": book.borrowed_on,
-            "return_on": book.return_on
-        }
-        for book in borrowed_books
-    ]
-    return Response(output)
+    return Response(loan_rows(LendedBook.objects.all()))
+
+#streams the whole loan ledger as a file for the librarian dashboard, in CSV (default)
+#or NDJSON with ?output=ndjson. The rows are sent while they are read, so large
+#libraries do not load every loan in memory (see exports.py)
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_borrowed_books(request):
+    output = request.GET.get('output', 'csv')
+    if output not in EXPORT_FORMATS:
+        return Response({'error': f"Unknown output, use one of: {', '.join(EXPORT_FORMATS)}"}, status=400)
+    rows, content_type, extension = EXPORT_FORMATS[output]
+    response = StreamingHttpResponse(rows(), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="borrowed_books.{extension}"'
+    return response
 
 #allows the bookseller to search for books that have been borrowed 
 #using the username, the title of the books, the isbn and the authors
 @api_view(['GET'])
+@renderer_classes(FAST_RENDERERS)
 def search_borrowed_books(request):
     query = request.GET.get('query', '').strip()
     searched_books = LendedBook.objects.none()
@@ -239,19 +303,7 @@ def search_borrowed_books(request):
             Q(book__authors__name__icontains=query)
         ).distinct()
 
-    output = [
-        {
-            "title": book.book.title,
-            "isbn": book.book.isbn,
-            "authors": book.book.authors.all().values_list('name', flat=True),
-            "borrowed_by": book.user.username,
-            "number": book.number,
-            "borrowed_on": book.borrowed_on,
-            "return_on": book.return_on
-        }
-        for book in searched_books
-    ]
-    return Response(output)
+    return Response(loan_rows(searched_books))
 
 #this view allows the librarian to return a book, if the book is returned
 #correctly it is removed from the lended books list and the book copies are updated
@@ -265,13 +317,7 @@ def return_book_api(request):
         returned_book = get_object_or_404(LendedBook, book_id=book_id, user__username=username)
         
         if returned_book.number >= quantity:
-            if returned_book.number == quantity:
-                returned_book.delete()
-            else:
-                returned_book.number -= quantity
-                returned_book.save()
-                
-            Book.objects.filter(isbn=book_id).update(lended=models.F('lended') - quantity)
+            return_loan(returned_book, quantity)
             return Response({'message': f"{quantity} book(s) returned successfully."})
         else:
             return Response({'error': "Cannot return more books than borrowed."}, status=400)
@@ -279,79 +325,62 @@ def return_book_api(request):
     except LendedBook.DoesNotExist:
         return Response({'error': "Book not found."}, status=404)
 
-#this view allows the librarian to add a new book to the library
+#this view allows the librarian to add a new book to the library.
+#A shipment can be added in one call by sending "books", a list of books (or a JSON string of it
+#in multipart forms); the cover of each book is then sent as the file "cover_<isbn>"
 @api_view(['POST'])
 def add_book_api(request):
     try:
         data = request.data
-        
-        # Parse JSON strings back to lists
-        authors = json.loads(data['authors'])
-        genres = json.loads(data['genres'])
-        
-        # Verify all authors exist before creating the book
-        for author_name in authors:
-            try:
-                Author.objects.get(name=author_name)
-            except Author.DoesNotExist:
-                return Response({'error': f'Author "{author_name}" does not exist'}, status=400)
-        
-        # Verify all genres exist before creating the book
-        for genre_name in genres:
-            try:
-                Genre.objects.get(name=genre_name)
-            except Genre.DoesNotExist:
-                return Response({'error': f'Genre "{genre_name}" does not exist'}, status=400)
-        
-        # Create the book
-        book = Book.objects.create(
-            isbn=data['isbn'],
-            title=data['title'],
-            copies=data['copies'],
-            year=data['year']
-        )
-        
-        # Add existing authors
-        for author_name in authors:
-            author = Author.objects.get(name=author_name)
-            book.authors.add(author)
-            
-        # Add existing genres
-        for genre_name in genres:
-            genre = Genre.objects.get(name=genre_name)
-            book.genres.add(genre)
-            
-        # Handle cover image
-        if 'cover' in request.FILES:
-            book.cover = request.FILES['cover']
-            book.save()
-            
+        if 'books' in data:
+            entries = data['books']
+            if isinstance(entries, str):
+                entries = json.loads(entries)
+            covers = {
+                entry['isbn']: request.FILES[f"cover_{entry['isbn']}"]
+                for entry in entries if isinstance(entry, dict) and f"cover_{entry.get('isbn')}" in request.FILES
+            } if isinstance(entries, list) else {}
+        else:
+            entries = [data]
+            covers = {data.get('isbn'): request.FILES['cover']} if 'cover' in request.FILES else {}
+
+        isbns = add_books(entries, covers)
+
+        if 'books' in data:
+            return Response({'message': f'{len(isbns)} books added successfully', 'isbns': isbns}, status=201)
         return Response({'message': 'Book added successfully'}, status=201)
     except json.JSONDecodeError:
-        return Response({'error': 'Invalid JSON format for authors or genres'}, status=400)
-    except Exception as e:
-        if 'book' in locals():  # If the book was created, it is deleted
-            book.delete()
+        return Response({'error': 'Invalid JSON format for books'}, status=400)
+    except BookDataError as e:
         return Response({'error': str(e)}, status=400)
+    except (IntegrityError, DataError, TypeError, ValueError):  # negative copies, a title too long, a year that is not a number...
+        return Response({'error': 'Invalid book data'}, status=400)
 
 @api_view(['GET'])
+@conditional(etag_func=catalog_etag)
 def get_authors_api(request):
-    authors = Author.objects.all().values_list('name', flat=True)
-    return Response(list(authors))
+    return cached_json('authors', lambda: list(Author.objects.all().values_list('name', flat=True)))
 
 #this view returns the list of all genres
 @api_view(['GET'])
+@conditional(etag_func=catalog_etag)
 def get_genres_api(request):
-    genres = Genre.objects.all().values_list('name', flat=True)
-    return Response(list(genres))
+    return cached_json('genres', lambda: list(Genre.objects.all().values_list('name', flat=True)))
 
-#this view returns the details of a book and the reviews, it is used in the book page
+#this view returns the hit/miss counters of the catalog cache, for monitoring
 @api_view(['GET'])
+@permission_classes([IsAdminUser])
+def get_cache_stats(request):
+    return Response(cache_stats())
+
+#this view returns the details of a book and the reviews, it is used in the book page.
+#If the page did not change since the last visit (If-None-Match) it answers 304 without loading it
+@api_view(['GET'])
+@conditional(etag_func=book_etag)
 def get_book_details(request, isbn):
     try:
-        book = Book.objects.prefetch_related('authors', 'reviews').get(isbn=isbn)
-        reviews = Review.objects.filter(book=book)
-        average_rating = reviews.aggregate(Avg('rating'))['rating__avg']
+        book = Book.objects.prefetch_related('authors', 'genres').get(isbn=isbn)
+        reviews = Review.objects.filter(book=book).select_related('user')
         
         # Check if book is in user's wishlist
         in_wishlist = False
@@ -360,14 +389,15 @@ def get_book_details(request, isbn):
         
         output = {
             "title": book.title,
-            "genres": book.genres.all().values_list('name', flat=True),
+            "genres": [genre.name for genre in book.genres.all()],
             "isbn": book.isbn,
-            "authors": book.authors.all().values_list('name', flat=True),
-            "cover": book.cover.url if book.cover else None,
+            "authors": [author.name for author in book.authors.all()],
+            "cover": cover_url(book.cover.name, book.cover_variants, "detail"),
+            "cover_srcset": cover_srcset(book.cover.name, book.cover_variants),
             "copies": book.copies,
             "lended": book.lended,
             "year": book.year,
-            "average_rating": float(average_rating) if average_rating else 0,
+            "average_rating": float(book.average_rating),
             "reviews": [
                 {
                     "id": review.id,
@@ -376,25 +406,46 @@ def get_book_details(request, isbn):
                     "content": review.content
                 } for review in reviews
             ],
-            "in_wishlist": in_wishlist
+            "in_wishlist": in_wishlist,
+            "also_borrowed": [neighbour_card(row) for row in neighbours_of(isbn)]
         }
         return Response(output)
     except Book.DoesNotExist:
         return Response({'error': 'Book not found'}, status=404)
 
+#this view returns only the reviews of a book, with the same conditional GET support
+@api_view(['GET'])
+@conditional(etag_func=reviews_etag, last_modified_func=book_last_modified)
+def get_book_reviews(request, isbn):
+    book = get_object_or_404(Book, isbn=isbn)
+    reviews = Review.objects.filter(book=book).select_related('user')
+    return Response({
+        "average_rating": float(book.average_rating),
+        "reviews": [
+            {
+                "id": review.id,
+                "user": review.user.username,
+                "rating": review.rating,
+                "content": review.content
+            } for review in reviews
+        ]
+    })
+
 #this view allows the user to add a book to the wishlist
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def toggle_wishlist(request, isbn):
     try:
         book = get_object_or_404(Book, isbn=isbn)
-        wishlist_item, created = Wishlist.objects.get_or_create(user=request.user, book=book)
+        with transaction.atomic():
+            wishlist_item, created = Wishlist.objects.get_or_create(user=request.user, book=book)
 
-        if not created:
-            wishlist_item.delete()
-            in_wishlist = False
-        else:
-            in_wishlist = True
+            if not created:
+                wishlist_item.delete()
+                in_wishlist = False
+            else:
+                record(isbn, WISH)
+                in_wishlist = True
 
         return Response({'in_wishlist': in_wishlist}, status=200)
     except Book.DoesNotExist:
@@ -414,22 +465,23 @@ def add_review(request, isbn):
         rating = request.data.get('rating')
         content = request.data.get('content')
 
-        review = Review.objects.create(
-            book=book,
-            user=user,
-            rating=rating,
-            content=content
-        )
-
-        # Calculate new average rating
-        new_average = Review.objects.filter(book=book).aggregate(Avg('rating'))['rating__avg']
+        # The review and the rating aggregates of the book are saved together
+        with transaction.atomic():
+            review = Review.objects.create(
+                book=book,
+                user=user,
+                rating=rating,
+                content=content
+            )
+            record(isbn, REVIEW)
+        book.refresh_from_db(fields=['review_count', 'rating_sum'])
 
         return Response({
             "id": review.id,
             "user": review.user.username,
             "rating": review.rating,
             "content": review.content,
-            "average_rating": float(new_average) if new_average else 0
+            "average_rating": float(book.average_rating)
         }, status=201)
     except Exception as e:
         return Response({'error': str(e)}, status=400)
@@ -441,14 +493,13 @@ def delete_review(request, isbn, review_id):
     try:
         review = get_object_or_404(Review, id=review_id, book__isbn=isbn, user=request.user)
         book = review.book
-        review.delete()
-        
-        # Calculate new average rating
-        new_average = Review.objects.filter(book=book).aggregate(Avg('rating'))['rating__avg']
+        with transaction.atomic():
+            review.delete()
+        book.refresh_from_db(fields=['review_count', 'rating_sum'])
         
         return Response({
             'message': 'Review deleted successfully',
-            'average_rating': float(new_average) if new_average else 0
+            'average_rating': float(book.average_rating)
         }, status=200)
     except Review.DoesNotExist:
         return Response({'error': 'Review not found or you are not authorized to delete it'}, status=404)
@@ -480,7 +531,7 @@ def forgot_password(request):
         uid = urlsafe_base64_encode(force_bytes(user.pk))
         token = default_token_generator.make_token(user)
         
-        # Send reset email
+        # Queue reset email
         reset_url = f"http://localhost:3000/reset-password/{uid}/{token}"
         subject = 'Password Reset Request'
         message = render_to_string('registration/password_reset_email.html', {
@@ -488,12 +539,11 @@ def forgot_password(request):
             'reset_url': reset_url,
         })
         
-        send_mail(
+        queue_mail(
             subject,
             message,
             settings.DEFAULT_FROM_EMAIL,
             [user.email],
-            fail_silently=False,
         )
         
         return Response({'message': 'Password reset instructions sent to your email'}, status=200)
@@ -560,7 +610,7 @@ def resend_verification_email(request):
     try:
         user = User.objects.get(email=email, is_active=False)
         
-        # Send verification email
+        # Queue verification email
         subject = 'Verify your email'
         message = render_to_string('registration/verification_email.html', {
             'user': user,
@@ -568,33 +618,90 @@ def resend_verification_email(request):
             'uid': urlsafe_base64_encode(force_bytes(user.pk)),
             'token': default_token_generator.make_token(user),
         })
-        send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
+        queue_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
         
         return Response({'message': 'Verification email has been resent.'}, status=200)
     except User.DoesNotExist:
         return Response({'error': 'No inactive user found with this email address'}, status=404)
 
-#this view allows the user to search for a book using the title, the isbn and the authors
+#this view returns the completions of the search box for ?q=, the most borrowed first:
+#book titles (with their isbn), authors and genres. It is answered from the in-memory
+#index of autocomplete.py, without queries
 @api_view(['GET'])
-def search_books(request):
-    query = request.GET.get('query', '')
-    books = Book.objects.filter(
-        Q(title__icontains=query) |
-        Q(isbn__icontains=query) |
-        Q(authors__name__icontains=query) |
-        Q(genres__name__icontains=query)
-    ).distinct()
+def autocomplete_api(request):
+    try:
+        limit = int(request.GET.get('limit', AUTOCOMPLETE_LIMIT))
+    except ValueError:
+        limit = AUTOCOMPLETE_LIMIT
+    limit = max(1, min(limit, AUTOCOMPLETE_MAX_LIMIT))
+    output = [
+        {'kind': entry['kind'], 'label': entry['label'], **({'isbn': entry['isbn']} if 'isbn' in entry else {})}
+        for entry in autocomplete(request.GET.get('q', ''), limit)
+    ]
+    return Response(output)
 
+#this view returns the trending books, the most borrowed, reviewed and wished lately first,
+#overall or in the ?genre= shelf. They are read from the popularity tables of popularity.py
+#(an index scan) and not aggregated from the loans
+@api_view(['GET'])
+@renderer_classes(FAST_RENDERERS)
+def trending_api(request):
+    try:
+        limit = int(request.GET.get('limit', TRENDING_LIMIT))
+    except ValueError:
+        limit = TRENDING_LIMIT
+    limit = max(1, min(limit, TRENDING_MAX_LIMIT))
+    rows = list(trending(limit, request.GET.get('genre') or None))
+    authors = authors_by_book({row['book__isbn'] for row in rows})
+    now = timezone.now()
     output = [
-        {
-            "isbn": book.isbn,
-            "title": book.title,
-            "authors": book.authors.all().values_list('name', flat=True),
-            "cover": book.cover.url if book.cover else None
-        }
-        for book in books
+        {**book_card(row, authors, 'book__'), "score": round(decayed_score(row['log_score'], now), 3)}
+        for row in rows
     ]
     return Response(output)
 
+#this view returns the circulation stats of the librarian dashboard for one dimension
+#(?dimension=genre, author, year or all), read from the materialized rollup (see analytics.py).
+#?order=borrowed (default), overdue, available, rating or name and ?limit= choose the rows
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@renderer_classes(FAST_RENDERERS)
+def circulation_analytics(request):
+    dimension = request.GET.get('dimension', 'genre')
+    ordering = request.GET.get('order', 'borrowed')
+    if dimension not in DIMENSIONS:
+        return Response({'error': f"Unknown dimension, use one of: {', '.join(DIMENSIONS)}"}, status=400)
+    if ordering not in ORDERINGS:
+        return Response({'error': f"Unknown order, use one of: {', '.join(ORDERINGS)}"}, status=400)
+    try:
+        limit = int(request.GET.get('limit', ANALYTICS_LIMIT))
+    except ValueError:
+        limit = ANALYTICS_LIMIT
+    limit = max(1, min(limit, ANALYTICS_MAX_LIMIT))
+    return Response({
+        'dimension': dimension,
+        'recent_days': RECENT_DAYS,
+        **freshness(),
+        'rows': circulation_stats(dimension, ordering, limit),
+    })
+
+#this view refreshes the circulation stats now, for the librarian who needs them up to date
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def refresh_circulation_analytics(request):
+    try:
+        refresh_analytics()
+    except RefreshInProgress:
+        return Response({'error': "A refresh is already running."}, status=409)
+    return Response(freshness())
+
+#this view allows the user to search for a book using the title, the isbn, the authors and the genres
+#the best matches come first (see search.py)
+@api_view(['GET'])
+@renderer_classes(FAST_RENDERERS)
+def search_books(request):
+    query = request.GET.get('query', '')
+    return Response(book_cards(search_catalog(query)))
+
 
 
@@ -44,6 +44,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'allauth',
     'allauth.account',
     'library',
@@ -67,9 +68,14 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'allauth.account.middleware.AccountMiddleware'
+    'allauth.account.middleware.AccountMiddleware',
+    'library.middleware.QueryCountMiddleware',
 ]
 
+#SQL queries per request, sent in the X-DB-Queries/X-DB-Time headers and logged (library.queries)
+QUERY_COUNT_HEADERS = DEBUG
+QUERY_COUNT_WARNING = config('QUERY_COUNT_WARNING', default=50, cast=int)    # log a warning above this
+
 ROOT_URLCONF = 'library_management.urls'
 
 TEMPLATES = [
@@ -102,6 +108,31 @@ DATABASES = {
         'PASSWORD': config('DATABASE_PASSWORD'),
         'HOST': config('DATABASE_HOST'),
         'PORT': config('DATABASE_PORT'),
+        # persistent connections (seconds), only used when the pool is disabled
+        'CONN_MAX_AGE': config('DATABASE_CONN_MAX_AGE', default=0, cast=int),
+        'CONN_HEALTH_CHECKS': True,    # also checks the pooled connections before handing them out
+        'OPTIONS': {
+            'connect_timeout': config('DATABASE_CONNECT_TIMEOUT', default=5, cast=int),
+        },
+    }
+}
+
+#Connection pool (psycopg 3): the requests borrow an open connection instead of connecting.
+#Size it with the bench_db_connections command, max size x workers must stay below max_connections
+if config('DATABASE_POOL', default=True, cast=bool):
+    DATABASES['default']['CONN_MAX_AGE'] = 0   # the pool replaces persistent connections
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': config('DATABASE_POOL_MIN_SIZE', default=2, cast=int),
+        'max_size': config('DATABASE_POOL_MAX_SIZE', default=10, cast=int),
+        'timeout': config('DATABASE_POOL_TIMEOUT', default=10, cast=float),     # wait for a free connection
+        'max_idle': config('DATABASE_POOL_MAX_IDLE', default=600, cast=float),  # close idle extra connections
+    }
+
+#Cache for the catalog lists, use a shared backend (e.g. Redis) when running several workers
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
     }
 }
 
@@ -118,6 +149,7 @@ ACCOUNT_EMAIL_REQUIRED = True
 #Media for Book Images
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+COVER_VARIANT_WORKERS = config('COVER_VARIANT_WORKERS', default=2, cast=int)    # processes resizing the covers
 
 
 # Password validation
@@ -168,7 +200,7 @@ LOGIN_URL = '/login/'       # Login URL
 # REST Framework settings
 REST_FRAMEWORK = {
      'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'library.authentication.ClaimsJWTAuthentication',
       ],
 }
 
@@ -176,8 +208,15 @@ SIMPLE_JWT = {
      'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
      'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
      'ROTATE_REFRESH_TOKENS': True,
-     'BLACKLIST_AFTER_ROTATION': True
+     'BLACKLIST_AFTER_ROTATION': True,
+     # the profile is stored in the token, read-only requests do not load the user
+     'TOKEN_OBTAIN_SERIALIZER': 'library.authentication.LibraryTokenObtainPairSerializer',
+    # the blacklist is checked against an in-process Bloom filter, see library/blacklist.py
+    'TOKEN_REFRESH_SERIALIZER': 'library.authentication.LibraryTokenRefreshSerializer',
 }
+JWT_USER_CACHE_TTL = config('JWT_USER_CACHE_TTL', default=0, cast=int)    # seconds the full User of writes is cached, 0 disables it
+# seconds a refresh token blacklisted by another worker can still be refreshed here, 0 checks the database every time
+JWT_BLACKLIST_SYNC_SECONDS = config('JWT_BLACKLIST_SYNC_SECONDS', default=5, cast=int)
 
 CORS_ORIGIN_ALLOW_ALL = True
 